@@ -0,0 +1,194 @@
+from datetime import datetime, time, timedelta, timezone
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import select
+from app import db
+from auth.identity import current_role
+from auth.permissions import has_permission, permission_required
+from auth.routes import item_filters
+from models.assignment_events import AssignmentEvent
+from models.items import Item
+from models.users import User
+from services.search import SEARCH_LIMIT, SEARCH_MAX_LIMIT, search
+from utils.replicas import read_only
+from utils.serialize import dumps, rows_to_dicts
+
+api_bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+# Exposed columns per resource; ?fields= picks a subset. password_hash is never listed.
+# Table columns rather than ORM attributes, so results come back as plain rows.
+ITEM_FIELDS = {column: Item.__table__.c[column] for column in (
+    'id', 'name', 'serial_number', 'bill_number', 'date_of_purchase', 'warranty', 'assigned_to_id')}
+USER_FIELDS = {column: User.__table__.c[column] for column in (
+    'id', 'first_name', 'last_name', 'email', 'phone_no', 'dob', 'role')}
+
+API_PAGE_SIZE = 1000
+API_MAX_PAGE_SIZE = 100000
+
+
+class ParameterError(ValueError):
+    pass
+
+
+class FieldError(ParameterError):
+    pass
+
+
+# Requested field names, in the order asked for; all fields when ?fields= is absent
+def selected_fields(available):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(available)
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise FieldError(f"Unknown fields: {', '.join(unknown)}" if unknown else 'No fields requested')
+    return fields
+
+
+# Keyset cursor needs the id, so it is always fetched last; zip() with the field names drops it
+def fetch_columns(available, fields):
+    return [available[name] for name in fields] + [available['id'].label('cursor')]
+
+
+# Core execution on the session's connection (replica-aware): no ORM loading step per row
+def rows_of(query):
+    return db.session.connection().execute(query).all()
+
+
+def page_limit():
+    limit = request.args.get('limit', API_PAGE_SIZE, type=int)
+    return min(max(limit, 1), API_MAX_PAGE_SIZE)
+
+
+# JSON body with a content ETag; If-None-Match on an unchanged body gets an empty 304
+def conditional_json(payload):
+    response = current_app.response_class(dumps(payload), mimetype='application/json')
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def page_payload(key, rows, fields, limit):
+    next_cursor = rows[limit - 1].cursor if len(rows) > limit else None
+    return {key: rows_to_dicts(rows[:limit], fields), 'next_cursor': next_cursor}
+
+
+# occurred_at is stored as naive UTC, so values with an offset are converted to it
+def naive_utc(value):
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# [start, end) from ?date=YYYY-MM-DD (that whole day) or ?from=&to= (ISO dates or datetimes, `to` defaults to now)
+def time_range():
+    try:
+        if 'date' in request.args:
+            start = datetime.combine(datetime.strptime(request.args['date'], '%Y-%m-%d'), time.min)
+            return start, start + timedelta(days=1)
+        start = naive_utc(datetime.fromisoformat(request.args['from']))
+        end = naive_utc(datetime.fromisoformat(request.args['to'])) if 'to' in request.args else datetime.utcnow()
+    except KeyError:
+        raise ParameterError('Pass date=YYYY-MM-DD or from=...&to=...')
+    except ValueError:
+        raise ParameterError('Dates must be ISO 8601, e.g. 2024-03-01 or 2024-03-01T09:30')
+    if end <= start:
+        raise ParameterError('to must be after from')
+    return start, end
+
+
+def spans_to_dicts(key, spans):
+    return [{key: holder, 'from': held_from, 'to': held_until} for holder, held_from, held_until in spans]
+
+
+@api_bp.errorhandler(ParameterError)
+def field_error(error):
+    return jsonify({'success': False, 'error': str(error)}), 400
+
+
+@api_bp.route('/items', methods=['GET'])
+@read_only
+@permission_required('items:view', json=True)
+def list_items():
+    fields = selected_fields(ITEM_FIELDS)
+    filters = item_filters(request.args)
+    filters['limit'] = page_limit()
+    query = Item.page_query(**filters, columns=fetch_columns(ITEM_FIELDS, fields))
+    rows = rows_of(query)
+    return conditional_json(page_payload('items', rows, fields, filters['limit']))
+
+
+@api_bp.route('/items/<int:item_id>', methods=['GET'])
+@read_only
+@permission_required('items:view', json=True)
+def get_item(item_id):
+    fields = selected_fields(ITEM_FIELDS)
+    row = db.session.execute(select(*[ITEM_FIELDS[name] for name in fields]).where(Item.id == item_id)).first()
+    if row is None:
+        return jsonify({'success': False, 'error': 'Item not found'}), 404
+    return conditional_json(dict(zip(fields, row)))
+
+
+# Who held the item with serial number `serial` over the range
+@api_bp.route('/items/history', methods=['GET'])
+@read_only
+@permission_required('items:view', json=True)
+def item_history():
+    start, end = time_range()
+    item_id = db.session.scalar(select(Item.id).where(Item.serial_number == request.args.get('serial')))
+    if item_id is None:
+        return jsonify({'success': False, 'error': 'Item not found'}), 404
+    holders = AssignmentEvent.holders(item_id, start, end)
+    return current_app.response_class(
+        dumps({'item_id': item_id, 'holders': spans_to_dicts('user_id', holders)}), mimetype='application/json')
+
+
+@api_bp.route('/users', methods=['GET'])
+@read_only
+@permission_required('users:view', json=True)
+def list_users():
+    fields = selected_fields(USER_FIELDS)
+    limit = page_limit()
+    query = select(*fetch_columns(USER_FIELDS, fields)).order_by(User.id).limit(limit + 1)
+    after_id = request.args.get('after', type=int)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    rows = rows_of(query)
+    return conditional_json(page_payload('users', rows, fields, limit))
+
+
+@api_bp.route('/users/<int:user_id>', methods=['GET'])
+@read_only
+@permission_required('users:view', json=True)
+def get_user(user_id):
+    fields = selected_fields(USER_FIELDS)
+    row = db.session.execute(select(*[USER_FIELDS[name] for name in fields]).where(User.id == user_id)).first()
+    if row is None:
+        return jsonify({'success': False, 'error': 'User not found'}), 404
+    return conditional_json(dict(zip(fields, row)))
+
+
+# Items the user held over the range
+@api_bp.route('/users/<int:user_id>/history', methods=['GET'])
+@read_only
+@permission_required('users:view', json=True)
+def user_history(user_id):
+    start, end = time_range()
+    held = AssignmentEvent.held_by(user_id, start, end)
+    return current_app.response_class(
+        dumps({'user_id': user_id, 'items': spans_to_dicts('item_id', held)}), mimetype='application/json')
+
+
+# Fuzzy search over item names, serial and bill numbers and user names and emails.
+# ?type=item or ?type=user narrows it; users are only searched with users:view.
+@api_bp.route('/search', methods=['GET'])
+@read_only
+@permission_required('items:view', json=True)
+def search_all():
+    query = request.args.get('q', '').strip()
+    if not query:
+        raise ParameterError('q is required')
+    limit = min(max(request.args.get('limit', SEARCH_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
+    kinds = {'item', 'user'} if has_permission(current_role(), 'users:view') else {'item'}
+    if request.args.get('type'):
+        kinds &= {request.args['type']}
+    return current_app.response_class(dumps({'results': search(query, limit, kinds)}), mimetype='application/json')
@@ -0,0 +1,272 @@
+import asyncio
+import json
+from urllib.parse import parse_qsl
+from itsdangerous import BadSignature
+from sqlalchemy import insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_cookie
+from app import create_app
+from auth.identity import version_key
+from auth.routes import EMPLOYEE_SEARCH_LIMIT, EMPLOYEE_SEARCH_MAX_LIMIT, item_filters
+from models.assignment_events import AssignmentEvent
+from models.items import Item
+from models.users import User
+from signals import send_items_changed, send_users_changed
+from utils.pool import engine_options
+
+# ASGI entry point serving the JSON API for items and users on an async engine, so one
+# process can hold thousands of open requests without a thread each. HTML pages stay on
+# the WSGI app. Run with e.g.: uvicorn asgi:create_asgi_app --factory
+# Needs an async driver for the database: aiomysql for MySQL, aiosqlite for SQLite.
+
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+ROUTES = {}
+
+
+def route(method, path, permission):
+    def decorator(handler):
+        ROUTES[(method, path)] = (handler, permission)
+        return handler
+    return decorator
+
+
+def async_database_uri(config):
+    uri = config.get('ASYNC_SQLALCHEMY_DATABASE_URI')
+    if uri:
+        return uri
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    return url.render_as_string(hide_password=False)
+
+
+def int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class JSONRequest:
+    def __init__(self, scope, body, session):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1')))
+        self.body = body
+        self.session = session
+
+    def json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+
+class AsyncAPI:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        uri = async_database_uri(flask_app.config)
+        options = engine_options(flask_app.config, uri)
+        options.pop('poolclass', None)  # async engines use their own queue pool
+        self.engine = create_async_engine(uri, **options)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            body = await read_body(receive)
+            status, payload = await self.dispatch(scope, body)
+            await send_json(send, status, payload)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def dispatch(self, scope, body):
+        handler, permission = ROUTES.get((scope['method'], scope['path']), (None, None))
+        if handler is None:
+            return 404, {'success': False, 'error': 'Not found'}
+
+        # Same signed cookie and role permissions as the WSGI app
+        session = self.load_session(scope)
+        if 'loggedin' not in session:
+            return 401, {'success': False, 'error': 'You are not logged in'}
+        permissions = self.flask_app.extensions['permissions'].get(await self.current_role(session), ())
+        if permission not in permissions:
+            self.flask_app.logger.warning('Unauthorized access attempt to %s', scope['path'])
+            return 403, {'success': False, 'error': 'You are not allowed to do that'}
+
+        with self.flask_app.app_context():
+            payload, status = await handler(self, JSONRequest(scope, body, session))
+        return status, payload
+
+    # Role from the session's identity snapshot while its version is current (as in the
+    # WSGI app), otherwise from the database; None once the user is gone
+    async def current_role(self, session):
+        user_id = session.get('id')
+        if user_id is None:
+            return None
+        snapshot = session.get('identity')
+        if snapshot and snapshot['id'] == user_id:
+            if self.flask_app.extensions['identity_versions'].get(version_key(user_id)) == snapshot['v']:
+                return snapshot['role']
+        async with self.session() as db_session:
+            return await db_session.scalar(select(User.role).where(User.id == user_id))
+
+    def load_session(self, scope):
+        headers = dict(scope['headers'])
+        cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+        value = cookies.get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        if not value:
+            return {}
+        serializer = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+        max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+        try:
+            return serializer.loads(value, max_age=max_age)
+        except BadSignature:
+            return {}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# Assignment history goes into the same transaction as the change, as in the sync routes
+async def record_events(session, moves, actor_id):
+    if moves:
+        await session.execute(insert(AssignmentEvent.__table__), AssignmentEvent.rows(moves, actor_id))
+
+
+# Same filters, cursor and response as /admin_dashboard/all_items.json
+@route('GET', '/api/items', 'items:view')
+async def list_items(api, request):
+    filters = item_filters(request.args)
+    async with api.session() as session:
+        items = (await session.scalars(Item.page_query(**filters))).all()
+    items, next_cursor = Item.split_page(items, filters['limit'])
+    return {'items': [item.to_dict() for item in items], 'next_cursor': next_cursor}, 200
+
+
+# Same results and cache as /admin_dashboard/employees/search
+@route('GET', '/api/users/search', 'users:view')
+async def search_users(api, request):
+    prefix = request.args.get('q', '').strip().lower()
+    limit = request.args.get('limit', EMPLOYEE_SEARCH_LIMIT, type=int)
+    limit = min(max(limit, 1), EMPLOYEE_SEARCH_MAX_LIMIT)
+
+    cache = api.flask_app.extensions['employee_search_cache']
+    employees = cache.get((prefix, limit))
+    if employees is None:
+        results = {}
+        async with api.session() as session:
+            for column in User.SEARCH_COLUMNS:
+                for row in await session.execute(User.search_prefix_query(column, prefix, limit)):
+                    results.setdefault(row.id, dict(row._mapping))
+                if len(results) >= limit:
+                    break
+        employees = list(results.values())[:limit]
+        cache.set((prefix, limit), employees)
+    return {'employees': employees}, 200
+
+
+# {"item_id": 1, "assigned_to": 2} assigns, "assigned_to": null unassigns
+@route('POST', '/api/items/assign', 'items:manage')
+async def assign_item(api, request):
+    data = request.json() or {}
+    item_id = int_or_none(data.get('item_id'))
+    assigned_to_id = int_or_none(data.get('assigned_to'))
+    if item_id is None or (data.get('assigned_to') is not None and assigned_to_id is None):
+        return {'success': False, 'error': 'item_id and assigned_to must be integers'}, 400
+
+    async with api.session() as session:
+        item = await session.get(Item, item_id)
+        if item is None:
+            return {'success': False, 'error': 'Item not found'}, 404
+        if assigned_to_id is not None:
+            if await session.get(User, assigned_to_id) is None:
+                return {'success': False, 'error': 'User not found'}, 404
+            existing = await session.scalar(select(Item.id).where(
+                Item.assigned_to_id == assigned_to_id, Item.name == item.name).limit(1))
+            if existing is not None:
+                return {'success': False, 'error': f'User already has an item named {item.name}'}, 409
+
+        previous_owner_id = item.assigned_to_id
+        item.assigned_to_id = assigned_to_id
+        await record_events(session, {item_id: assigned_to_id} if previous_owner_id != assigned_to_id else {},
+                            request.session.get('id'))
+        await session.commit()
+    # Receivers write the change counters and clear caches synchronously; keep them off the loop
+    await asyncio.to_thread(send_items_changed, api.flask_app,
+                            user_ids=[previous_owner_id, assigned_to_id], item_ids={item_id})
+    api.flask_app.logger.info('Item assigned successfully: %s to user %s', item_id, assigned_to_id)
+    return {'success': True, 'item': item.to_dict()}, 200
+
+
+@route('DELETE', '/api/items', 'items:manage')
+async def delete_item(api, request):
+    item_id = int_or_none((request.json() or {}).get('id'))
+    async with api.session() as session:
+        item = await session.get(Item, item_id) if item_id is not None else None
+        if item is None:
+            return {'success': False, 'error': 'Item not found'}, 404
+        owner_id = item.assigned_to_id
+        await session.delete(item)
+        await record_events(session, {item_id: None} if owner_id is not None else {}, request.session.get('id'))
+        await session.commit()
+    await asyncio.to_thread(send_items_changed, api.flask_app, user_ids=[owner_id], item_ids={item_id})
+    api.flask_app.logger.info('Item deleted successfully: %s', item.name)
+    return {'success': True}, 200
+
+
+@route('DELETE', '/api/users', 'users:manage')
+async def delete_user(api, request):
+    user_id = int_or_none((request.json() or {}).get('id'))
+    async with api.session() as session:
+        user = None
+        if user_id is not None:
+            user = await session.scalar(select(User).options(selectinload(User.items)).where(User.id == user_id))
+        if user is None:
+            return {'success': False, 'error': 'User not found'}, 404
+        # Deleting the user unassigns their items
+        released_ids = {item.id for item in user.items}
+        await session.delete(user)
+        await record_events(session, dict.fromkeys(released_ids), request.session.get('id'))
+        await session.commit()
+    await asyncio.to_thread(send_users_changed, api.flask_app, user_ids=[user_id])
+    await asyncio.to_thread(send_items_changed, api.flask_app, user_ids=[user_id], item_ids=released_ids)
+    api.flask_app.logger.info('User deleted successfully: %s', user.email)
+    return {'success': True}, 200
+
+
+def create_asgi_app(config_name='default', overrides=None):
+    return AsyncAPI(create_app(config_name, overrides))
@@ -0,0 +1,148 @@
+import hashlib
+from time import monotonic
+from flask import current_app, g, session
+from flask.globals import _cv_request
+from app import db
+from models.users import User
+from signals import users_changed
+from utils.replicas import on_primary
+
+
+# The parts of a user the dashboards and profile pages render, kept in the session
+class Identity:
+    def __init__(self, snapshot):
+        self.id = snapshot['id']
+        self.first_name = snapshot['first_name']
+        self.last_name = snapshot['last_name']
+        self.email = snapshot['email']
+        self.dob = snapshot['dob']
+        self.phone_no = snapshot['phone_no']
+        self.role = snapshot['role']
+
+
+def version_key(user_id):
+    return f'identity_version:{user_id}'
+
+
+# Record that `snapshot` is current, so for IDENTITY_RECHECK_SECONDS this worker answers
+# permission checks from a plain dict instead of the identity_versions cache. The entry
+# carries the role's compiled permissions so the check needs nothing else.
+def confirm_version(app, snapshot):
+    confirmed = app.extensions['confirmed_identities']
+    if len(confirmed) >= app.config['CACHE_MAX_ENTRIES']:
+        confirmed.clear()
+    expires = monotonic() + app.config['IDENTITY_RECHECK_SECONDS']
+    permissions = app.extensions['permissions'].get(snapshot['role'], frozenset())
+    confirmed[snapshot['id']] = (snapshot['v'], expires, snapshot['role'], permissions)
+
+
+# The identity fields of a user row (or of another Identity)
+def user_snapshot(user):
+    return {
+        'id': user.id,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+        'dob': str(user.dob) if user.dob else None,
+        'phone_no': user.phone_no,
+        'role': user.role,
+    }
+
+
+# Digest of what a snapshot shows. Every worker computes the same version for the same
+# row, so a snapshot is only replaced when the user really changed.
+def identity_version(snapshot):
+    fields = [snapshot[key] for key in sorted(snapshot) if key != 'v']
+    return hashlib.sha1(repr(fields).encode()).hexdigest()[:16]
+
+
+# Store a snapshot of `user` in the (signed) session cookie, stamped with its version, and
+# record that version as current. users_changed drops the recorded version, so the next
+# request re-reads the row. Across workers the drop needs the shared CACHE_BACKEND
+# ('redis'); with 'memory' each worker notices after at most CACHE_TTL.
+def remember_identity(user):
+    snapshot = user_snapshot(user)
+    snapshot['v'] = identity_version(snapshot)
+    app = current_app._get_current_object()
+    app.extensions['identity_versions'].set(version_key(user.id), snapshot['v'])
+    confirm_version(app, snapshot)
+    # Rewriting an unchanged snapshot would only send the cookie again
+    if session.get('identity') != snapshot:
+        session['identity'] = snapshot
+    return Identity(snapshot)
+
+
+def load_identity():
+    # Every permission check lands here; resolve the session proxy once
+    current = session._get_current_object()
+    user_id = current.get('id')
+    if user_id is None:
+        return None
+    snapshot = current.get('identity')
+    if snapshot and snapshot['id'] == user_id:
+        app = current_app._get_current_object()
+        version = app.extensions['identity_versions'].get(version_key(user_id))
+        if version == snapshot['v']:
+            confirm_version(app, snapshot)
+            return Identity(snapshot)
+
+    # No snapshot yet, or this worker has no current version for the user. Permissions
+    # depend on the row, so it is read from the primary rather than a lagging replica.
+    with on_primary():
+        user = db.session.get(User, user_id)
+    if user is None:
+        current.pop('identity', None)
+        return None
+    return remember_identity(user)
+
+
+# The logged-in user for this request, loaded at most once per request
+def current_user():
+    request_globals = g._get_current_object()
+    if 'current_user' not in request_globals:
+        request_globals.current_user = load_identity()
+    return request_globals.current_user
+
+
+# Entry confirming the session's snapshot, None when it has to be checked again
+def confirmed_identity(current, app):
+    entry = app.extensions['confirmed_identities'].get(current.get('id'))
+    if entry is not None and entry[1] > monotonic():
+        snapshot = current.get('identity')
+        # Versions digest the user id too, so a match means the snapshot is this user's
+        if snapshot is not None and snapshot['v'] == entry[0]:
+            return entry
+    return None
+
+
+# Role of the logged-in user, None when the user no longer exists
+def current_role():
+    ctx = _cv_request.get()
+    entry = confirmed_identity(ctx.session, ctx.app)
+    if entry is not None:
+        return entry[2]
+    user = current_user()
+    return user.role if user else None
+
+
+# Permissions of the logged-in user. Every guarded view lands here, so a confirmed snapshot
+# is answered from the session and one dict: no proxies, cache lock or Identity object.
+def session_permissions(current, app):
+    entry = confirmed_identity(current, app)
+    if entry is not None:
+        return entry[3]
+    user = current_user()
+    return app.extensions['permissions'].get(user.role, frozenset()) if user else frozenset()
+
+
+def forget_current_user():
+    g.pop('current_user', None)
+
+
+@users_changed.connect
+def invalidate_identities(app, user_ids):
+    versions = app.extensions['identity_versions']
+    confirmed = app.extensions['confirmed_identities']
+    for user_id in user_ids:
+        versions.delete(version_key(user_id))
+        confirmed.pop(user_id, None)
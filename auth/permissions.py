@@ -0,0 +1,57 @@
+from functools import wraps
+from flask import current_app, flash, jsonify, redirect, request, session, url_for
+from flask.globals import _cv_request
+from auth.identity import session_permissions
+
+NO_PERMISSIONS = frozenset()
+
+
+# Role -> frozenset of permissions, built once per app from ROLE_PERMISSIONS.
+# A role may include another role's permissions with 'role:<name>', to any depth.
+def compile_permissions(role_permissions):
+    compiled = {}
+
+    def expand(role, path):
+        if role in compiled:
+            return compiled[role]
+        if role in path:
+            raise ValueError(f"ROLE_PERMISSIONS: cyclic role inheritance {' -> '.join(path + (role,))}")
+        if role not in role_permissions:
+            raise ValueError(f'ROLE_PERMISSIONS: {path[-1]} includes unknown role {role}')
+        permissions = set()
+        for permission in role_permissions[role]:
+            permissions.add(permission)
+            if permission.startswith('role:'):
+                permissions |= expand(permission.split(':', 1)[1], path + (role,))
+        compiled[role] = frozenset(permissions)
+        return compiled[role]
+
+    for role in role_permissions:
+        expand(role, ())
+    return compiled
+
+
+def has_permission(role, permission):
+    return permission in current_app.extensions['permissions'].get(role, NO_PERMISSIONS)
+
+
+# Allow the view only when the logged-in user's role grants `permission`. The role comes
+# from the versioned identity snapshot, so a role change or deletion applies from the next request.
+# Denied HTML requests are flashed `message` and sent to login; json=True views get 401/403.
+def permission_required(permission, message='You are not logged in', json=False):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Straight from the request context: each lookup through the proxies costs more than the check itself
+            ctx = _cv_request.get()
+            current = ctx.session
+            if 'loggedin' in current and permission in session_permissions(current, ctx.app):
+                return view(*args, **kwargs)
+            current_app.logger.warning('Unauthorized access attempt to %s', request.endpoint)
+            if json:
+                status = 403 if 'loggedin' in session else 401
+                return jsonify({'success': False, 'error': message}), status
+            flash(message, 'error')
+            return redirect(url_for('auth_bp.login'))
+        return wrapper
+    return decorator
@@ -1,11 +1,38 @@
 from datetime import datetime
-from flask import Blueprint, request, jsonify, render_template, flash, redirect, session, url_for, current_app
+import hmac
+import io
+from flask import Blueprint, request, jsonify, render_template, flash, redirect, session, url_for, current_app, stream_with_context
+from sqlalchemy.orm import selectinload
 from app import db
+from auth.identity import Identity, current_user, forget_current_user, remember_identity, user_snapshot
+from auth.permissions import permission_required
 from models.users import User
 from models.items import Item
+from models.assignment_events import AssignmentEvent
+from services.assigned_items import get_assigned_items
+from services.assignments import apply_assignments, parse_pairs
+from services.exporter import export_items
+from services.fragments import item_cards, user_cards
+from services.importer import format_from_filename, import_items, import_users
+from services.passwords import HashingPoolSaturated, hashing_pool, needs_rehash
+from services.table_versions import versioned_view
+from utils.pool import pool_status
+from utils.replicas import read_only
+from signals import send_items_changed, send_users_changed, users_changed
 
 auth_bp = Blueprint('auth_bp', __name__)
 
+# Shed load while the password hashing pool is full rather than queueing behind it
+@auth_bp.errorhandler(HashingPoolSaturated)
+def hashing_pool_saturated(error):
+    current_app.logger.warning('Rejected %s: password hashing pool saturated', request.endpoint)
+    return 'Server is busy, please try again shortly', 503, {'Retry-After': '1'}
+
+# current_user() is memoized per request
+@auth_bp.before_app_request
+def reset_current_user():
+    forget_current_user()
+
 # First Page render when we run the application
 @auth_bp.route('/')
 def home():
@@ -48,16 +75,27 @@ def register():
                 dob=dob,
                 phone_no=phone_no,
                 email=email,
-                password=password
+                password_hash=hashing_pool().hash(password)
             )
             db.session.add(user)
             db.session.commit()
+            send_users_changed(current_app._get_current_object())
             msg = "Registration successful"
             flash("Registration successful", 'success')
             current_app.logger.info('User registered successfully: %s', email)
             return redirect(url_for('auth_bp.login'))
     return render_template("register.html", message=msg)
 
+def login_email_key(email):
+    return f'login:email:{email.lower()}'
+
+# Count a login attempt against both the client IP and the email it targets
+def login_allowed(email):
+    limits = current_app.extensions['login_limits']
+    if not limits['ip'].hit(f'login:ip:{request.remote_addr}'):
+        return False
+    return not email or limits['email'].hit(login_email_key(email))
+
 # Route for Login
 @auth_bp.route('/login', methods=['POST', 'GET'])
 def login():
@@ -71,17 +109,44 @@ def login():
             msg = "Email and password are required"
             current_app.logger.warning('Login failed: %s', msg)
 
+        # Checked before the user lookup and PBKDF2 so a credential-stuffing burst stays cheap
+        if not login_allowed(email):
+            flash("Too many login attempts, please try again later", "error")
+            current_app.logger.warning('Login rate limited for email %s from %s', email, request.remote_addr)
+            retry_after = str(current_app.config['LOGIN_RATE_WINDOW'])
+            return render_template("login.html"), 429, {'Retry-After': retry_after}
+
         user = User.query.filter_by(email=email).first()
-        if not user or not user.verify_password(password):
+        password_hash = user.password_hash if user else None
+        # Copy what the login needs first: the rollback expires the row, and reading it
+        # again would re-SELECT (or fail if the user was deleted meanwhile)
+        user = Identity(user_snapshot(user)) if user else None
+        # Hand the pooled connection back while PBKDF2 runs
+        db.session.rollback()
+        passwords = hashing_pool()
+        if not user or not passwords.verify(password_hash, password):
             flash("Invalid email or password", "error")
             current_app.logger.warning('Login failed: Invalid email or password for email %s', email)
         else:
+            # Upgrade hashes made with an older work factor while we have the plain password
+            if needs_rehash(password_hash, passwords.iterations):
+                try:
+                    new_hash = passwords.hash(password)
+                    row = db.session.get(User, user.id)
+                    if row is not None:
+                        row.password_hash = new_hash
+                        db.session.commit()
+                except HashingPoolSaturated:
+                    current_app.logger.info('Rehash deferred for %s: hashing pool saturated', email)
+            current_app.extensions['login_limits']['email'].reset(login_email_key(email))
             session['loggedin'] = True
             session['id'] = user.id
             session['first_name'] = user.first_name
             session['email'] = user.email
+            session['role'] = user.role
+            remember_identity(user)
 
-            if email == "admin@nucleusteq.com":
+            if user.role == 'admin':
                 flash("Admin logged in successfully","success")
                 current_app.logger.info('Admin logged in: %s', email)
                 return redirect(url_for('auth_bp.admin_dashboard', user_id=session.get('id')))
@@ -94,357 +159,525 @@ def login():
 
 # Employee home page render when an employee gets logged in
 @auth_bp.route('/employee_dashboard', methods=['GET'])
+@permission_required('profile:view')
 def employee_dashboard():
-    if 'loggedin' in session:
-        user_name = session['first_name']
-        current_app.logger.info('Employee dashboard accessed by user: %s', user_name)
-        return render_template('employee_dashboard.html', user_name=user_name)
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to employee dashboard')
-    return redirect(url_for('auth_bp.login'))
+    user_name = session['first_name']
+    current_app.logger.info('Employee dashboard accessed by user: %s', user_name)
+    return render_template('employee_dashboard.html', user_name=user_name)
 
 
 
 # Employee assigned items list
 @auth_bp.route('/assigned_item', methods=['GET'])
+@read_only
+@permission_required('items:own')
 def assigned_item():
-    if 'loggedin' in session:
-        user_id = session['id']
-        user = User.query.filter_by(id=user_id).first()
-        if user:
-            items = Item.query.filter_by(assigned_to_id=user.id).all()
-            current_app.logger.info('Assigned items accessed by user: %s', user.email)
-            return render_template('assigned_items.html', items=items, user=user)
-        else:
-            flash("User not found", "error")
-            current_app.logger.warning('User not found: %s', user_id)
-            return redirect(url_for('auth_bp.login'))
+    user_id = session['id']
+    user = current_user()
+    if user:
+        items = get_assigned_items(user.id)
+        current_app.logger.info('Assigned items accessed by user: %s', user.email)
+        return render_template('assigned_items.html', items=items, user=user)
+    else:
+        flash("User not found", "error")
+        current_app.logger.warning('User not found: %s', user_id)
+        return redirect(url_for('auth_bp.login'))
 
 # Employee profile route
 @auth_bp.route('/profile')
+@read_only
+@permission_required('profile:view')
 def profile():
-    if 'loggedin' in session:
-        user_id = session['id']
-        user = User.query.filter_by(id=user_id).first()
-        if user:
-            user_details = {
-                'id': user.id,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'dob': user.dob,
-                'email': user.email,
-                'mobile': user.phone_no
-            }
-            current_app.logger.info('Profile accessed by user: %s', user.email)
-            return render_template('profile.html', user_id=user_id, user=user_details)
-        else:
-            flash("User not found", "error")
-            current_app.logger.warning('User not found: %s', user_id)
-            return redirect(url_for('auth_bp.login'))
-
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to profile')
-    return redirect(url_for('auth_bp.login'))
+    user_id = session['id']
+    user = current_user()
+    if user:
+        user_details = {
+            'id': user.id,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'dob': user.dob,
+            'email': user.email,
+            'mobile': user.phone_no
+        }
+        current_app.logger.info('Profile accessed by user: %s', user.email)
+        return render_template('profile.html', user_id=user_id, user=user_details)
+    else:
+        flash("User not found", "error")
+        current_app.logger.warning('User not found: %s', user_id)
+        return redirect(url_for('auth_bp.login'))
 
 # Admin Routes
 @auth_bp.route('/admin_dashboard', methods=['GET'])
+@permission_required('dashboard:admin', message='You are not admin')
 def admin_dashboard():
-    if 'loggedin' in session and session['email'] == 'admin@nucleusteq.com':
-        user_name = session['first_name']
-        current_app.logger.info('Admin dashboard accessed by: %s', user_name)
-        return render_template('admin_dashboard.html', user_name=user_name)
-    flash('You are not admin', 'error')
-    current_app.logger.warning('Unauthorized access attempt to admin dashboard')
-    return redirect(url_for('auth_bp.login'))
+    user_name = session['first_name']
+    current_app.logger.info('Admin dashboard accessed by: %s', user_name)
+    return render_template('admin_dashboard.html', user_name=user_name)
 
 
 
 # Admin profile route
 @auth_bp.route('/admin_dashboard/admin_profile')
+@read_only
+@permission_required('dashboard:admin', message='User not found')
 def admin_profile():
-    if 'loggedin' in session and session['email'] == 'admin@nucleusteq.com':
-        user_id = session['id']
-        user = User.query.filter_by(id=user_id).first()
-        if user:
-            user_details = {
-                'id': user.id,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'dob': user.dob,
-                'email': user.email,
-                'mobile': user.phone_no
-            }
-            current_app.logger.info('Admin profile accessed by: %s', user.email)
-            return render_template('admin_profile.html', user=user_details)
+    user = current_user()
+    if user:
+        user_details = {
+            'id': user.id,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'dob': user.dob,
+            'email': user.email,
+            'mobile': user.phone_no
+        }
+        current_app.logger.info('Admin profile accessed by: %s', user.email)
+        return render_template('admin_profile.html', user=user_details)
 
     flash("User not found", "error")
-    current_app.logger.warning('Admin user not found: %s', id)
+    current_app.logger.warning('Admin user not found: %s', session['id'])
     return redirect(url_for('auth_bp.login'))
 
+# Connection pool usage for this worker, to size DB_POOL_* against the worker count
+@auth_bp.route('/admin_dashboard/pool_stats', methods=['GET'])
+@permission_required('stats:view', message='You are not admin', json=True)
+def pool_stats():
+    status = pool_status(db.engine)
+    router = current_app.extensions.get('replica_router')
+    if router:
+        status['replicas'] = router.status()
+    return jsonify(status)
+
+# Hit/miss counters of this worker's caches
+@auth_bp.route('/admin_dashboard/cache_stats', methods=['GET'])
+@permission_required('stats:view', message='You are not admin', json=True)
+def cache_stats():
+    return jsonify({'assigned_items': current_app.extensions['assigned_items_cache'].stats()})
+
+# Per-endpoint wall/SQL/template time histograms of this worker, in Prometheus text format.
+# Scrapers authenticate with the METRICS_TOKEN bearer token, people with stats:view.
+@auth_bp.route('/metrics', methods=['GET'])
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return metrics_text()
+    return admin_metrics_text()
+
+def metrics_text():
+    text = current_app.extensions['request_metrics'].render()
+    return text, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@permission_required('stats:view', message='You are not admin', json=True)
+def admin_metrics_text():
+    return metrics_text()
+
 # Route to fetch all users and display them
 @auth_bp.route('/admin_dashboard/all_users', methods=['GET'])
+@read_only
+@permission_required('users:view')
+@versioned_view('user', 'item')
 def all_users():
-    if 'loggedin' in session and session['email'] == 'admin@nucleusteq.com':
-        users = User.query.all()
-        for user in users:
-            user.items = Item.query.filter_by(assigned_to_id=user.id).all()
-        current_app.logger.info('All users accessed by admin')
-        return render_template('all_users.html', users=users)
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to all users')
-    return redirect(url_for('auth_bp.login'))
+    # One query for users plus one batched IN query for all their items
+    users = User.query.options(selectinload(User.items)).all()
+    current_app.logger.info('All users accessed by admin')
+    return render_template('all_users.html', user_cards=user_cards(users))
 
 # Route to add a user
 @auth_bp.route('/add_user', methods=['POST'])
+@permission_required('users:manage')
 def add_user():
-    if 'loggedin' in session and session['email'] == 'admin@nucleusteq.com':
-        data = request.form
-        first_name = data.get('first_name')
-        last_name = data.get('last_name')
-        dob = data.get('dob')
-        phone_no = data.get('phone_no')
-        email = data.get('email')
-        password = data.get('password')
-        role = data.get('role', 'user')
-        
-        if dob==None:
-            dob = datetime.now()
-        # Additional validations
-        if not all([first_name, last_name, phone_no, email, password, dob]):
-            flash("All fields are required")
-            current_app.logger.warning('Add user failed: Missing fields')
-            # return redirect(url_for('auth_bp.all_users'))
-
-        elif not User.is_valid_email(email):
-            flash("Invalid email address")
-            current_app.logger.warning('Add user failed: Invalid email %s', email)
-            # return redirect(url_for('auth_bp.all_users'))
-
-        elif User.query.filter_by(email=email).first():
-            flash("Email already exists")
-            current_app.logger.warning('Add user failed: Email already exists %s', email)
-            return redirect(url_for('auth_bp.all_users'))
-
-        elif User.query.filter_by(phone_no=phone_no).first():
-            flash("Phone number already exists")
-            current_app.logger.warning('Add user failed: Phone number already exists %s', phone_no)
-            return redirect(url_for('auth_bp.all_users'))
-
-        elif len(password) < 6:
-            flash("Password must be at least 6 characters long")
-            current_app.logger.warning('Add user failed: Password too short')
-            return redirect(url_for('auth_bp.all_users'))
-
-        elif len(phone_no) != 10 or not phone_no.isdigit():
-            flash("Phone number must be a 10-digit number")
-            current_app.logger.warning('Add user failed: Invalid phone number')
-            return redirect(url_for('auth_bp.all_users'))
-        else:
-            try:
-                dob = datetime.strptime(dob, '%Y-%m-%d')
-                if dob > datetime.now():
-                    flash('Date of purchase cannot be in the future', 'error')
-                    return redirect(url_for('auth_bp.all_items'))
-            except ValueError:
-                flash("Invalid date format for Date of Birth")
-                current_app.logger.warning('Add user failed: Invalid date format for DOB')
-                return redirect(url_for('auth_bp.all_users'))
-
-            user = User(
-                first_name=first_name,
-                last_name=last_name,
-                dob=dob,
-                phone_no=phone_no,
-                email=email,
-                password=password,
-                role=role
-            )
-            user.password = password
-
-            db.session.add(user)
-            db.session.commit()
-
-            flash("Employee added successfully")
-            current_app.logger.info('User added successfully: %s', email)
+    data = request.form
+    first_name = data.get('first_name')
+    last_name = data.get('last_name')
+    dob = data.get('dob')
+    phone_no = data.get('phone_no')
+    email = data.get('email')
+    password = data.get('password')
+    role = data.get('role', 'user')
+
+    if dob==None:
+        dob = datetime.now()
+    # Additional validations
+    if not all([first_name, last_name, phone_no, email, password, dob]):
+        flash("All fields are required")
+        current_app.logger.warning('Add user failed: Missing fields')
+        # return redirect(url_for('auth_bp.all_users'))
+
+    elif not User.is_valid_email(email):
+        flash("Invalid email address")
+        current_app.logger.warning('Add user failed: Invalid email %s', email)
+        # return redirect(url_for('auth_bp.all_users'))
+
+    elif User.query.filter_by(email=email).first():
+        flash("Email already exists")
+        current_app.logger.warning('Add user failed: Email already exists %s', email)
+        return redirect(url_for('auth_bp.all_users'))
+
+    elif User.query.filter_by(phone_no=phone_no).first():
+        flash("Phone number already exists")
+        current_app.logger.warning('Add user failed: Phone number already exists %s', phone_no)
+        return redirect(url_for('auth_bp.all_users'))
+
+    elif len(password) < 6:
+        flash("Password must be at least 6 characters long")
+        current_app.logger.warning('Add user failed: Password too short')
+        return redirect(url_for('auth_bp.all_users'))
+
+    elif not User.is_valid_phone(phone_no):
+        flash("Phone number must be a 10-digit number")
+        current_app.logger.warning('Add user failed: Invalid phone number')
+        return redirect(url_for('auth_bp.all_users'))
+
+    elif role not in current_app.extensions['permissions']:
+        flash("Unknown role")
+        current_app.logger.warning('Add user failed: Unknown role %s', role)
+        return redirect(url_for('auth_bp.all_users'))
+    else:
+        try:
+            dob = datetime.strptime(dob, '%Y-%m-%d')
+            if dob > datetime.now():
+                flash('Date of purchase cannot be in the future', 'error')
+                return redirect(url_for('auth_bp.all_items'))
+        except ValueError:
+            flash("Invalid date format for Date of Birth")
+            current_app.logger.warning('Add user failed: Invalid date format for DOB')
             return redirect(url_for('auth_bp.all_users'))
 
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to add user')
-    return redirect(url_for('auth_bp.login'))
+        user = User(
+            first_name=first_name,
+            last_name=last_name,
+            dob=dob,
+            phone_no=phone_no,
+            email=email,
+            password_hash=hashing_pool().hash(password),
+            role=role
+        )
 
+        db.session.add(user)
+        db.session.commit()
+        send_users_changed(current_app._get_current_object())
+
+        flash("Employee added successfully")
+        current_app.logger.info('User added successfully: %s', email)
+        return redirect(url_for('auth_bp.all_users'))
+
+    return redirect(url_for('auth_bp.all_users'))
+
+
+# Route to bulk import users from an uploaded CSV or JSONL file
+@auth_bp.route('/import_users', methods=['POST'])
+@permission_required('users:manage', json=True)
+def import_users_file():
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+    fmt = request.form.get('format') or format_from_filename(upload.filename)
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'success': False, 'error': 'Unsupported format'}), 400
+
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    report = import_users(stream, fmt, pool=hashing_pool())
+    if report.inserted:
+        send_users_changed(current_app._get_current_object())
+    current_app.logger.info('Bulk user import: %s inserted, %s errors, %s rows/s',
+                            report.inserted, report.error_count, report.rows_per_second)
+    return jsonify({'success': True, **report.to_dict()})
 
 # Route to delete a user
 @auth_bp.route('/delete_user', methods=['DELETE'])
+@permission_required('users:manage')
 def delete_user():
-    if 'loggedin' in session and session['email'] == 'admin@nucleusteq.com':
-        data = request.get_json()
-        user_id = data.get('id')
-        user = User.query.get(user_id)
-
-        if user:
-            db.session.delete(user)
-            db.session.commit()
-            current_app.logger.info('User deleted successfully: %s', user.email)
-            return jsonify({'success': True})
-        else:
-            current_app.logger.warning('Delete user failed: User not found ')
-            return jsonify({'success': False, 'error': 'User not found'}), 404
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to delete user')
-    return redirect(url_for('auth_bp.login'))
+    data = request.get_json()
+    user_id = data.get('id')
+    user = User.query.get(user_id)
+
+    if user:
+        # Deleting the user unassigns their items
+        released_ids = {item.id for item in user.items}
+        db.session.delete(user)
+        AssignmentEvent.record(dict.fromkeys(released_ids), actor_id=session.get('id'))
+        db.session.commit()
+        send_users_changed(current_app._get_current_object(), user_ids=[user_id])
+        send_items_changed(current_app._get_current_object(), user_ids=[user_id], item_ids=released_ids)
+        current_app.logger.info('User deleted successfully: %s', user.email)
+        return jsonify({'success': True})
+    else:
+        current_app.logger.warning('Delete user failed: User not found ')
+        return jsonify({'success': False, 'error': 'User not found'}), 404
+
+@users_changed.connect
+def clear_employee_search_cache(app, user_ids):
+    app.extensions['employee_search_cache'].clear()
+
+EMPLOYEE_SEARCH_LIMIT = 10
+EMPLOYEE_SEARCH_MAX_LIMIT = 25
+
+# Typeahead for the assign-to picker: prefix match on first/last name and email
+@auth_bp.route('/admin_dashboard/employees/search', methods=['GET'])
+@read_only
+@permission_required('users:view', json=True)
+def search_employees():
+    prefix = request.args.get('q', '').strip().lower()
+    limit = request.args.get('limit', EMPLOYEE_SEARCH_LIMIT, type=int)
+    limit = min(max(limit, 1), EMPLOYEE_SEARCH_MAX_LIMIT)
+
+    cache = current_app.extensions['employee_search_cache']
+    key = (prefix, limit)
+    employees = cache.get(key)
+    if employees is None:
+        employees = User.search_prefix(prefix, limit=limit)
+        cache.set(key, employees)
+    return jsonify({'employees': employees})
 
 # Routes for items
+ITEMS_PAGE_SIZE = 50
+ITEMS_MAX_PAGE_SIZE = 200
+
+# Read the list filters and keyset cursor from query string args
+def item_filters(args):
+    status = args.get('status')
+    if status not in ('assigned', 'unassigned'):
+        status = None
+    limit = args.get('limit', ITEMS_PAGE_SIZE, type=int)
+    return {
+        'status': status,
+        'owner_id': args.get('owner', type=int),
+        'name_prefix': args.get('q', '').strip() or None,
+        'after_id': args.get('after', type=int),
+        'limit': min(max(limit, 1), ITEMS_MAX_PAGE_SIZE),
+    }
+
 # Route to fetch the details of items
 @auth_bp.route('/admin_dashboard/all_items', methods=['GET'])
+@read_only
+@permission_required('items:view')
+@versioned_view('item', 'user')
 def all_items():
-    if 'loggedin' in session:
-        items = Item.query.all()
-        employees = User.query.all()
-        current_app.logger.info('All items accessed')
-        return render_template('items.html', items=items, employees=employees)
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to all items')
-    return redirect(url_for('auth_bp.login'))
-
+    filters = item_filters(request.args)
+    items, next_cursor = Item.page(**filters)
+    current_app.logger.info('All items accessed')
+    return render_template('items.html', item_cards=item_cards(items), filters=filters, next_cursor=next_cursor)
+
+# JSON variant of the item list, same filters and cursor
+@auth_bp.route('/admin_dashboard/all_items.json', methods=['GET'])
+@read_only
+@permission_required('items:view', json=True)
+def all_items_json():
+    items, next_cursor = Item.page(**item_filters(request.args))
+    current_app.logger.info('All items accessed (json)')
+    return jsonify({'items': [item.to_dict() for item in items], 'next_cursor': next_cursor})
+
+# Stream the full asset register as CSV or JSONL, optionally gzipped
+@auth_bp.route('/admin_dashboard/export_items', methods=['GET'])
+@permission_required('items:view')
+def export_items_file():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'success': False, 'error': 'Unsupported format'}), 400
+    compress = request.args.get('gzip') in ('1', 'true')
+
+    filename = f'items.{fmt}.gz' if compress else f'items.{fmt}'
+    if compress:
+        mimetype = 'application/gzip'
+    else:
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    current_app.logger.info('Item export started: %s', filename)
+    return current_app.response_class(
+        stream_with_context(export_items(fmt, compress=compress)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
 
 # Route to add an item
 @auth_bp.route('/admin_dashboard/add_item', methods=['POST'])
+@permission_required('items:manage')
 def add_item():
-    if 'loggedin' in session:
-        data = request.form
-        name = data.get('name')
-        serial_number = data.get('serial_number')
-        bill_number = data.get('bill_number')
-        date_of_purchase = data.get('date_of_purchase')
-        warranty = data.get('warranty')
-        assigned_to_id = data.get('assigned_to_id')
-        
-        # Check if date_of_purchase is not in the future
-        try:
-            purchase_date = datetime.strptime(date_of_purchase, '%Y-%m-%d')
-            if purchase_date > datetime.now():
-                flash('Date of purchase cannot be in the future', 'error')
-                return redirect(url_for('auth_bp.all_items'))
-        except ValueError:
-            flash('Invalid date format', 'error')
+    data = request.form
+    name = data.get('name')
+    serial_number = data.get('serial_number')
+    bill_number = data.get('bill_number')
+    date_of_purchase = data.get('date_of_purchase')
+    warranty = data.get('warranty')
+    assigned_to_id = data.get('assigned_to_id') or None
+
+    if assigned_to_id is not None:
+        if not assigned_to_id.isdigit() or db.session.get(User, int(assigned_to_id)) is None:
+            flash('Assigned user not found', 'error')
+            current_app.logger.warning('Add item failed: Invalid assignee %r', assigned_to_id)
             return redirect(url_for('auth_bp.all_items'))
-        
-        # Check if serial_number and bill_number are unique
-        if Item.query.filter_by(serial_number=serial_number).first():
-            flash('Serial number already exists', 'error')
-            return redirect(url_for('auth_bp.all_items'))
-        
-        if Item.query.filter_by(bill_number=bill_number).first():
-            flash('Bill number already exists', 'error')
+        assigned_to_id = int(assigned_to_id)
+
+    # Check if date_of_purchase is not in the future
+    try:
+        purchase_date = datetime.strptime(date_of_purchase, '%Y-%m-%d')
+        if purchase_date > datetime.now():
+            flash('Date of purchase cannot be in the future', 'error')
             return redirect(url_for('auth_bp.all_items'))
-        
-        new_item = Item(
-            name=name,
-            serial_number=serial_number,
-            bill_number=bill_number,
-            date_of_purchase=date_of_purchase,
-            warranty=warranty,
-            assigned_to_id=assigned_to_id
-        )
-        db.session.add(new_item)
-        db.session.commit()
-        flash('Item Added Successfully', 'success')
-        current_app.logger.info('Item added successfully: %s', name)
+    except ValueError:
+        flash('Invalid date format', 'error')
+        return redirect(url_for('auth_bp.all_items'))
+
+    # Check if serial_number and bill_number are unique
+    if Item.query.filter_by(serial_number=serial_number).first():
+        flash('Serial number already exists', 'error')
+        return redirect(url_for('auth_bp.all_items'))
+
+    if Item.query.filter_by(bill_number=bill_number).first():
+        flash('Bill number already exists', 'error')
         return redirect(url_for('auth_bp.all_items'))
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to add item')
-    return redirect(url_for('auth_bp.login'))
+
+    new_item = Item(
+        name=name,
+        serial_number=serial_number,
+        bill_number=bill_number,
+        date_of_purchase=purchase_date.date(),
+        warranty=warranty,
+        assigned_to_id=assigned_to_id
+    )
+    db.session.add(new_item)
+    if assigned_to_id:
+        db.session.flush()
+        AssignmentEvent.record({new_item.id: assigned_to_id}, actor_id=session.get('id'))
+    db.session.commit()
+    send_items_changed(current_app._get_current_object(), user_ids=[assigned_to_id], item_ids={new_item.id})
+    flash('Item Added Successfully', 'success')
+    current_app.logger.info('Item added successfully: %s', name)
+    return redirect(url_for('auth_bp.all_items'))
+
+# Route to bulk import items from an uploaded CSV or JSONL file
+@auth_bp.route('/admin_dashboard/import_items', methods=['POST'])
+@permission_required('items:manage', json=True)
+def import_items_file():
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+    fmt = request.form.get('format') or format_from_filename(upload.filename)
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'success': False, 'error': 'Unsupported format'}), 400
+
+    # Read straight from the upload stream so the file is never held in memory
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    report = import_items(stream, fmt)
+    if report.inserted:
+        send_items_changed(current_app._get_current_object(), user_ids=report.owner_ids)
+    current_app.logger.info('Bulk item import: %s inserted, %s errors', report.inserted, report.error_count)
+    return jsonify({'success': True, **report.to_dict()})
 
 # Route to assign an item to user
 @auth_bp.route('/admin_dashboard/assign_item', methods=['POST'])
+@permission_required('items:manage')
 def assign_item():
-    if 'loggedin' in session:
-        data = request.form
-        item_id = data.get('item_id')
-        assigned_to_id = data.get('assigned_to')
-        item = Item.query.get(item_id)
-
-        if item:
-            if assigned_to_id:
-                existing_item = Item.query.filter_by(assigned_to_id=assigned_to_id, name=item.name).first()
-                if existing_item:
-                    flash(f'User already has an item named {item.name}', 'error')
-                    current_app.logger.warning('Assign item failed: User %s already has item %s', assigned_to_id, item.name)
-                    return redirect(url_for('auth_bp.all_items'))
-
-                item.assigned_to_id = assigned_to_id
-                db.session.commit()
-                flash('Item assigned successfully', 'success')
-                current_app.logger.info('Item assigned successfully: %s to user %s', item.
-                name, assigned_to_id)
-        else:
-            flash('Item not found', 'error')
-            current_app.logger.warning('Assign item failed: Item not found %s', item_id)
+    data = request.form
+    item_id = data.get('item_id')
+    assigned_to_id = data.get('assigned_to')
+    item = Item.query.get(item_id)
+
+    if item:
+        if assigned_to_id:
+            if not assigned_to_id.isdigit() or db.session.get(User, int(assigned_to_id)) is None:
+                flash('User not found', 'error')
+                current_app.logger.warning('Assign item failed: Invalid assignee %r', assigned_to_id)
+                return redirect(url_for('auth_bp.all_items'))
+            assigned_to_id = int(assigned_to_id)
+            existing_item = Item.query.filter_by(assigned_to_id=assigned_to_id, name=item.name).first()
+            if existing_item:
+                flash(f'User already has an item named {item.name}', 'error')
+                current_app.logger.warning('Assign item failed: User %s already has item %s', assigned_to_id, item.name)
+                return redirect(url_for('auth_bp.all_items'))
 
-        return redirect(url_for('auth_bp.all_items'))
-    flash("You are not logged in", 'error') 
-    current_app.logger.warning('Unauthorized access attempt to assign item')
-    return redirect(url_for('auth_bp.login'))
+            previous_owner_id = item.assigned_to_id
+            item.assigned_to_id = assigned_to_id
+            if previous_owner_id != assigned_to_id:
+                AssignmentEvent.record({item.id: assigned_to_id}, actor_id=session.get('id'))
+            db.session.commit()
+            send_items_changed(current_app._get_current_object(),
+                               user_ids=[previous_owner_id, assigned_to_id], item_ids={item.id})
+            flash('Item assigned successfully', 'success')
+            current_app.logger.info('Item assigned successfully: %s to user %s', item.
+            name, assigned_to_id)
+    else:
+        flash('Item not found', 'error')
+        current_app.logger.warning('Assign item failed: Item not found %s', item_id)
+
+    return redirect(url_for('auth_bp.all_items'))
+
+# Route to assign or unassign many items in one transaction
+@auth_bp.route('/admin_dashboard/assign_items', methods=['POST'])
+@permission_required('items:manage', json=True)
+def assign_items():
+    data = request.get_json(silent=True) or {}
+    try:
+        pairs = parse_pairs(data.get('assignments'))
+    except ValueError as e:
+        current_app.logger.warning('Batch assign failed: %s', e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    results, owner_ids = apply_assignments(pairs, actor_id=session.get('id'))
+    send_items_changed(current_app._get_current_object(), user_ids=owner_ids,
+                       item_ids={result['item_id'] for result in results if result['success']})
+    applied = sum(1 for result in results if result['success'])
+    current_app.logger.info('Batch assign: %s of %s assignments applied', applied, len(results))
+    return jsonify({'success': applied == len(results), 'results': results})
 
 @auth_bp.route('/admin_dashboard/unassign_item/<int:item_id>', methods=['POST', 'GET'])
+@permission_required('items:manage')
 def unassign_item(item_id):
-    if 'loggedin' in session:
-        item = Item.query.get(item_id)
-        if item:
-            item.assigned_to_id = None
-            db.session.commit()
-            flash('Item Unassigned successfully', 'success')
-            current_app.logger.info('Item unassigned successfully: %s', item_id)
-        else:
-            flash('Item Not Found', 'error')
-        return redirect(url_for('auth_bp.all_items'))
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to unassign item')
-    return redirect(url_for('auth_bp.login'))
+    item = Item.query.get(item_id)
+    if item:
+        previous_owner_id = item.assigned_to_id
+        item.assigned_to_id = None
+        if previous_owner_id is not None:
+            AssignmentEvent.record({item_id: None}, actor_id=session.get('id'))
+        db.session.commit()
+        send_items_changed(current_app._get_current_object(), user_ids=[previous_owner_id], item_ids={item_id})
+        flash('Item Unassigned successfully', 'success')
+        current_app.logger.info('Item unassigned successfully: %s', item_id)
+    else:
+        flash('Item Not Found', 'error')
+    return redirect(url_for('auth_bp.all_items'))
 
 # Route to delete an item
 @auth_bp.route('/delete_item', methods=['DELETE'])
+@permission_required('items:manage')
 def delete_item():
-    if 'loggedin' in session:
-        data = request.get_json()
-        item_id = data.get('id')
-        item = Item.query.get(item_id)
-        if item:
-            db.session.delete(item)
-            db.session.commit()
-            flash('Item Deleted Successfully', 'success')
-            current_app.logger.info('Item deleted successfully: %s', item.name)
-        else:
-            flash('Item not found', 'error')
-            current_app.logger.warning('Delete item failed: Item not found %s', item_id)
-        return redirect(url_for('auth_bp.all_items'))
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to delete item')
-    return redirect(url_for('auth_bp.login'))
+    data = request.get_json()
+    item_id = data.get('id')
+    item = Item.query.get(item_id)
+    if item:
+        owner_id, deleted_id = item.assigned_to_id, item.id
+        db.session.delete(item)
+        if owner_id is not None:
+            AssignmentEvent.record({deleted_id: None}, actor_id=session.get('id'))
+        db.session.commit()
+        send_items_changed(current_app._get_current_object(), user_ids=[owner_id], item_ids={deleted_id})
+        flash('Item Deleted Successfully', 'success')
+        current_app.logger.info('Item deleted successfully: %s', item.name)
+    else:
+        flash('Item not found', 'error')
+        current_app.logger.warning('Delete item failed: Item not found %s', item_id)
+    return redirect(url_for('auth_bp.all_items'))
 
 # Route to update an item
 @auth_bp.route('/edit_item', methods=['POST'])
+@permission_required('items:manage')
 def edit_item():
-    if 'loggedin' in session:
-        data = request.form
-        item_id = data.get('item_id')
-        item = Item.query.get(item_id)
-        if item:
-            item.name = data.get('name')
-            item.serial_number = data.get('serial_number')
-            item.bill_number = data.get('bill_number')
-            item.date_of_purchase = data.get('date_of_purchase')
-            item.warranty = data.get('warranty')
-            db.session.commit()
-            flash("Item updated successfully", "success")
-            current_app.logger.info('Item updated successfully: %s', item.name)
-        else:
-            flash("Item not found", "error")
-            current_app.logger.warning('Update item failed: Item not found %s', item_id)
-        return redirect(url_for('auth_bp.all_items'))
-    flash("You are not logged in", 'error')
-    current_app.logger.warning('Unauthorized access attempt to update item')
-    return redirect(url_for('auth_bp.login'))
+    data = request.form
+    item_id = data.get('item_id')
+    item = Item.query.get(item_id)
+    if item:
+        item.name = data.get('name')
+        item.serial_number = data.get('serial_number')
+        item.bill_number = data.get('bill_number')
+        item.date_of_purchase = data.get('date_of_purchase')
+        item.warranty = data.get('warranty')
+        db.session.commit()
+        send_items_changed(current_app._get_current_object(), user_ids=[item.assigned_to_id], item_ids={item.id})
+        flash("Item updated successfully", "success")
+        current_app.logger.info('Item updated successfully: %s', item.name)
+    else:
+        flash("Item not found", "error")
+        current_app.logger.warning('Update item failed: Item not found %s', item_id)
+    return redirect(url_for('auth_bp.all_items'))
 
 # Log out route
 @auth_bp.route('/logout')
@@ -454,6 +687,7 @@ def logout():
     session.pop('full_name', None)
     session.pop('email', None)
     session.pop('role', None)
+    session.pop('identity', None)
     flash("You have been logged out.", "success")
     current_app.logger.info('User logged out')
     return redirect(url_for('auth_bp.login'))
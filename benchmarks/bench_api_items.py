@@ -0,0 +1,76 @@
+# Time to serve a 100k-item list from /api/v1/items (column tuples + fast encoder)
+# next to hydrating Items and calling to_dict() for the same rows.
+# Run from the repo root: python benchmarks/bench_api_items.py [--rows N]
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app import create_app, db
+from models.items import Item
+from models.users import User
+from utils import serialize
+
+
+def timed(label, fn, repeat=3):
+    best = min(_run(fn) for _ in range(repeat))
+    print(f'{label:32} {best * 1000:8.1f} ms')
+
+
+def _run(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    app.logger.setLevel(logging.ERROR)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Item), [
+            {'name': f'Item {i}', 'serial_number': f'SN-{i}', 'bill_number': f'BN-{i}',
+             'date_of_purchase': date(2023, 1, 1), 'warranty': '1 year'}
+            for i in range(args.rows)])
+        admin = User(first_name='Bench', last_name='Admin', phone_no='9000000000',
+                     email='bench.admin@nucleusteq.com', password_hash='x', role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+        def hydrate_orm():
+            items = Item.query.order_by(Item.id).all()
+            json.dumps([item.to_dict() for item in items])
+            db.session.remove()
+
+        timed('ORM objects + to_dict + json', hydrate_orm)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['loggedin'] = True
+        sess['id'] = admin_id
+        sess['role'] = 'admin'
+    url = f'/api/v1/items?limit={args.rows}'
+    print(f"encoder: {'orjson' if serialize.orjson else 'json'}")
+    timed('/api/v1/items (all fields)', lambda: client.get(url))
+    timed('/api/v1/items?fields=id,serial', lambda: client.get(url + '&fields=id,serial_number'))
+    etag = client.get(url).headers['ETag']
+    timed('/api/v1/items 304 revalidation', lambda: client.get(url, headers={'If-None-Match': etag}))
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
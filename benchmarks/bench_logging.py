@@ -0,0 +1,97 @@
+# Per-request latency of a logging route with the old synchronous RotatingFileHandlers
+# (maxBytes=10000, rotating every few dozen requests) next to the queued pipeline,
+# with and without sampling of the high-frequency "All items accessed" message.
+# Run from the repo root: python benchmarks/bench_logging.py [--requests N]
+import argparse
+import logging
+from logging.handlers import QueueHandler, RotatingFileHandler
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from models.users import User
+from utils.logs import TEXT_FORMAT, stop_listener
+
+
+def synchronous_handlers(app, log_dir):
+    handlers = []
+    for handler in [handler for handler in app.logger.handlers if isinstance(handler, QueueHandler)]:
+        app.logger.removeHandler(handler)
+        stop_listener(handler.listener)
+    for filename, level in (('general.log', logging.INFO), ('error.log', logging.ERROR)):
+        handler = RotatingFileHandler(os.path.join(log_dir, filename), maxBytes=10000, backupCount=3, delay=True)
+        handler.setLevel(level)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        app.logger.addHandler(handler)
+        handlers.append(handler)
+    return handlers
+
+
+# CPU time logger.info costs the calling (request) thread; the listener's share is not counted
+def call_cost(app, calls=20000):
+    started = time.thread_time()
+    for i in range(calls):
+        app.logger.info('Item assigned successfully: %s to user %s', i, 1)
+    return (time.thread_time() - started) / calls * 1e6
+
+
+def measure(label, app, requests, admin_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['loggedin'] = True
+        sess['id'] = admin_id
+        sess['role'] = 'admin'
+    for _ in range(50):
+        client.get('/admin_dashboard/all_items.json?limit=1')
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client.get('/admin_dashboard/all_items.json?limit=1')
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    print(f'{label:28} logger.info {call_cost(app):5.1f} us/call   request mean {statistics.fmean(samples):6.0f} us  '
+          f'p50 {samples[len(samples) // 2]:6.0f} us  p99 {samples[int(len(samples) * 0.99)]:6.0f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    for label, overrides, synchronous in [
+        ('sync RotatingFileHandler', {'LOG_SAMPLE_RATES': {}}, True),
+        ('queued', {'LOG_SAMPLE_RATES': {}}, False),
+        ('queued + sampling', {}, False),
+        ('queued + JSON + sampling', {'LOG_JSON': True}, False),
+    ]:
+        log_dir = tempfile.mkdtemp()
+        app = create_app('testing', dict(overrides, SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}', LOG_DIR=log_dir))
+        handlers = synchronous_handlers(app, log_dir) if synchronous else []
+        with app.app_context():
+            db.create_all()
+            admin = User.query.filter_by(role='admin').first()
+            if admin is None:
+                admin = User(first_name='Bench', last_name='Admin', phone_no='9000000000',
+                             email='bench.admin@nucleusteq.com', password_hash='x', role='admin')
+                db.session.add(admin)
+                db.session.commit()
+            admin_id = admin.id
+        measure(label, app, args.requests, admin_id)
+        stop_listener(app.extensions['log_listener'])
+        for handler in handlers:
+            app.logger.removeHandler(handler)
+            handler.close()
+        shutil.rmtree(log_dir)
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Latency of a cheap page while a burst of logins runs, with password hashing
+# inline on the request threads versus on the bounded hashing pool.
+# Run from the repo root: python benchmarks/bench_login_burst.py [--iterations N]
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+from app import create_app, db
+from models.users import User
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args):
+        return None
+
+
+opener = urllib.request.build_opener(NoRedirect)
+
+
+def fetch(url, data=None):
+    started = time.perf_counter()
+    try:
+        opener.open(url, data=data).read()
+        status = 200
+    except urllib.error.HTTPError as error:
+        status = error.code
+    return time.perf_counter() - started, status
+
+
+def run(label, overrides, args):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', **overrides})
+    app.logger.setLevel(logging.ERROR)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(first_name='Load', last_name='Test', phone_no='9999999999',
+                            email='load@nucleusteq.com', password='password'))
+        db.session.commit()
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    login = urllib.parse.urlencode({'email': 'load@nucleusteq.com', 'password': 'password'}).encode()
+
+    def page_latencies(seconds):
+        samples = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            samples.append(fetch(f'{base}/')[0])
+        return samples
+
+    quiet = page_latencies(args.seconds)
+
+    stop = threading.Event()
+    statuses = []
+
+    def login_client():
+        while not stop.is_set():
+            status = fetch(f'{base}/login', login)[1]
+            statuses.append(status)
+            if status == 503:
+                stop.wait(1)  # honour Retry-After
+
+    burst = [threading.Thread(target=login_client) for _ in range(args.login_clients)]
+    for thread in burst:
+        thread.start()
+    loaded = page_latencies(args.seconds)
+    stop.set()
+    for thread in burst:
+        thread.join()
+    server.shutdown()
+    app.extensions['password_hashing'].shutdown()
+    os.remove(path)
+
+    print(f'{label}:')
+    for name, samples in (('quiet', quiet), ('login burst', loaded)):
+        print(f'  {name:12} p50 {statistics.median(samples) * 1000:7.2f} ms'
+              f'  p99 {percentile(samples, 99) * 1000:7.2f} ms  ({len(samples)} requests)')
+    print(f'  logins: {statuses.count(302)} succeeded, {statuses.count(503)} rejected with 503')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--login-clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    common = {'PASSWORD_HASH_ITERATIONS': args.iterations}
+    run('inline hashing', {**common, 'PASSWORD_HASH_WORKERS': 0, 'PASSWORD_HASH_MAX_PENDING': 10000}, args)
+    run('hashing pool', {**common, 'PASSWORD_HASH_WORKERS': 2, 'PASSWORD_HASH_MAX_PENDING': 4}, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Per-request cost of @permission_required, measured against an unguarded view. The role
+# comes from the session's identity snapshot; once this worker has confirmed its version
+# (every IDENTITY_RECHECK_SECONDS) the check is a couple of dict lookups on the session.
+# Run from the repo root: python benchmarks/bench_permissions.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from flask import g
+from auth.identity import remember_identity
+from auth.permissions import permission_required
+from models.users import User
+
+ROUNDS = 200000
+
+
+def view():
+    return 'ok'
+
+
+# Each call stands for a new request: nothing memoized in g carries over. g is resolved
+# once so dropping the memo adds the same small constant to both measurements.
+def request(handler, request_globals):
+    def run():
+        request_globals.pop('current_user', None)
+        return handler()
+    return run
+
+
+def main():
+    app = create_app('testing')
+    guarded = permission_required('items:view')(view)
+    with app.test_request_context('/admin_dashboard/all_items'):
+        from flask import session
+        session['loggedin'] = True
+        session['id'] = 1
+        remember_identity(User(id=1, first_name='Bench', last_name='Admin', email='bench.admin@nucleusteq.com',
+                               phone_no='9000000000', role='admin'))
+        assert guarded() == 'ok'
+        request_globals = g._get_current_object()
+        bare = min(timeit.repeat(request(view, request_globals), number=ROUNDS, repeat=9)) / ROUNDS
+        checked = min(timeit.repeat(request(guarded, request_globals), number=ROUNDS, repeat=9)) / ROUNDS
+    overhead = (checked - bare) * 1e6
+    print(f'unguarded view: {bare * 1e9:.0f} ns')
+    print(f'guarded view:   {checked * 1e9:.0f} ns')
+    print(f'guard overhead: {overhead:.3f} us per request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+# Load test of the main routes: concurrent HTTP clients drive login, all_items, all_users,
+# assigned_item, add_item and assign_item over synthetic datasets of 1k/100k/1M items and
+# 10k users, and report throughput and p50/p95/p99 per route.
+# Results are compared with the baselines stored for the same backend, dataset and client
+# count; a regression past --tolerance, a route with no baseline, or any failed request
+# exits with status 1.
+# Baselines are machine-specific: record them on the machine that runs the check with
+# --save-baseline. Everything stays local: a temporary SQLite file by default, or a local
+# MySQL with --database-url mysql+pymysql://root:pw@localhost/bench_inventory (its tables
+# are dropped and re-seeded).
+# Run from the repo root: python benchmarks/bench_routes.py [--datasets 1k 100k 1M] [--clients N]
+import argparse
+import http.cookiejar
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import make_url
+from werkzeug.serving import make_server
+from app import create_app, db
+from models.items import Item
+from models.users import User, hash_password
+
+DATASETS = {'1k': 1000, '100k': 100000, '1M': 1000000}
+ROUTES = ('login', 'all_items', 'all_users', 'assigned_item', 'add_item', 'assign_item')
+NAMES = ['Laptop', 'Monitor', 'Keyboard', 'Mouse', 'Desk', 'Chair', 'Phone', 'Tablet', 'Headset', 'Dock']
+PASSWORD = 'password'
+ADMIN_EMAIL = 'bench.admin@nucleusteq.com'
+SEED_CHUNK = 50000
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+# Compared with the baseline; p99 is reported but too noisy to gate on
+CHECKED = (('throughput', -1), ('p50', 1), ('p95', 1))
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def user_email(i):
+    return f'bench.user{i}@nucleusteq.com'
+
+
+# Users first, then items: every third item is assigned, round robin over the users
+def seed(app, items, users, rng):
+    password_hash = hash_password(PASSWORD, app.config['PASSWORD_HASH_ITERATIONS'])
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(User), [
+            {'first_name': 'Bench', 'last_name': 'Admin', 'phone_no': '9000000000', 'email': ADMIN_EMAIL,
+             'password_hash': password_hash, 'role': 'admin'}])
+        for start in range(0, users, SEED_CHUNK):
+            db.session.execute(insert(User), [
+                {'first_name': f'First{i}', 'last_name': f'Last{i % 997}', 'dob': date(1990, 1, 1),
+                 'phone_no': f'{8000000000 + i}', 'email': user_email(i), 'password_hash': password_hash,
+                 'role': 'user'}
+                for i in range(start, min(start + SEED_CHUNK, users))])
+        db.session.commit()
+        user_ids = db.session.scalars(select(User.id).where(User.role == 'user').order_by(User.id)).all()
+        for start in range(0, items, SEED_CHUNK):
+            db.session.execute(insert(Item), [
+                {'name': f'{rng.choice(NAMES)} {i % 997}', 'serial_number': f'SN-{i:08d}',
+                 'bill_number': f'BN-{i:08d}', 'date_of_purchase': date(2023, 1, 1) + timedelta(days=i % 365),
+                 'warranty': '1 year', 'assigned_to_id': user_ids[i // 3 % len(user_ids)] if i % 3 == 0 else None}
+                for i in range(start, min(start + SEED_CHUNK, items))])
+            db.session.commit()
+        item_ids = db.session.execute(select(func.min(Item.id), func.max(Item.id))).one()
+        db.session.remove()
+    return item_ids, user_ids
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args):
+        return None
+
+
+# One simulated browser: its own cookie jar, redirects reported rather than followed
+class Client:
+    def __init__(self, base):
+        self.base = base
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+
+    def request(self, path, form=None):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base + path, data=data) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            status = error.code
+        return time.perf_counter() - started, status
+
+    def login(self, email):
+        elapsed, status = self.request('/login', {'email': email, 'password': PASSWORD})
+        if status != 302:
+            raise RuntimeError(f'Login as {email} failed with {status}')
+
+
+# route -> (who the clients log in as, expected status, request(client, rng))
+def scenarios(item_ids, user_ids):
+    serials = itertools.count()
+
+    def add_item(client, rng):
+        n = next(serials)
+        return client.request('/admin_dashboard/add_item', {
+            'name': f'{rng.choice(NAMES)} {n % 997}', 'serial_number': f'ADD-{n:08d}',
+            'bill_number': f'ADD-BN-{n:08d}', 'date_of_purchase': '2024-01-01', 'warranty': '1 year'})
+
+    return {
+        'login': ('nobody', 302, lambda client, rng: client.request(
+            '/login', {'email': user_email(rng.randrange(len(user_ids))), 'password': PASSWORD})),
+        'all_items': ('admin', 200, lambda client, rng: client.request('/admin_dashboard/all_items')),
+        'all_users': ('admin', 200, lambda client, rng: client.request('/admin_dashboard/all_users')),
+        'assigned_item': ('owner', 200, lambda client, rng: client.request('/assigned_item')),
+        'add_item': ('admin', 302, add_item),
+        'assign_item': ('admin', 302, lambda client, rng: client.request('/admin_dashboard/assign_item', {
+            'item_id': rng.randint(*item_ids), 'assigned_to': rng.choice(user_ids)})),
+    }
+
+
+# Every client sends requests back to back; only those started after the warm-up count.
+# Each client finishes at least one counted request, however slow the route.
+def drive(base, scenario, owners, args, seed_value):
+    login_as, expected, send = scenario
+    rng = random.Random(seed_value)
+    clients = [Client(base) for _ in range(args.clients)]
+    for client in clients:
+        if login_as == 'admin':
+            client.login(ADMIN_EMAIL)
+        elif login_as == 'owner':
+            client.login(user_email(rng.randrange(owners)))
+    samples, errors = [], []
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    deadline = measure_from + args.seconds
+
+    def run(client, client_rng):
+        counted = False
+        while True:
+            sent = time.perf_counter()
+            if sent >= deadline and counted:
+                return
+            elapsed, status = send(client, client_rng)
+            if sent >= measure_from:
+                counted = True
+                samples.append(elapsed)
+                if status != expected:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=run, args=(client, random.Random(rng.random()))) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - measure_from
+    return {
+        'requests': len(samples),
+        'errors': len(errors),
+        'throughput': round(len(samples) / elapsed, 2),
+        'p50': round(percentile(samples, 0.50) * 1000, 3) if samples else None,
+        'p95': round(percentile(samples, 0.95) * 1000, 3) if samples else None,
+        'p99': round(percentile(samples, 0.99) * 1000, 3) if samples else None,
+    }
+
+
+def run_dataset(label, args):
+    items = DATASETS[label]
+    path = None
+    uri = args.database_url
+    if not uri:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        uri = f'sqlite:///{path}'
+    log_dir = tempfile.mkdtemp()
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'LOG_DIR': log_dir,
+        'PASSWORD_HASH_ITERATIONS': args.hash_iterations,
+        # Every client comes from 127.0.0.1 and logs in over and over
+        'LOGIN_EMAIL_LIMIT': 10 ** 9,
+        'LOGIN_IP_LIMIT': 10 ** 9,
+        'DB_POOL_SIZE': args.clients,
+        'DB_MAX_OVERFLOW': args.clients,
+    })
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    started = time.perf_counter()
+    item_ids, user_ids = seed(app, items, args.users, random.Random(args.seed))
+    print(f'\n{make_url(uri).get_backend_name()}, {label} items / {args.users} users, {args.clients} clients '
+          f'(seeded in {time.perf_counter() - started:.1f} s)')
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    results = {}
+    try:
+        # The first users were dealt the seeded items
+        owners = min(len(user_ids), max(1, items // 3))
+        for i, (route, scenario) in enumerate(scenarios(item_ids, user_ids).items()):
+            if route in args.routes:
+                results[route] = drive(base, scenario, owners, args, args.seed + i)
+    finally:
+        server.shutdown()
+        app.extensions['password_hashing'].shutdown()
+        with app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(log_dir)
+        if path:
+            os.remove(path)
+
+    print(f"{'route':14} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'requests':>9} {'errors':>7}")
+    for route, result in results.items():
+        print(f"{route:14} {result['throughput']:8.2f} {result['p50'] or 0:9.2f} {result['p95'] or 0:9.2f} "
+              f"{result['p99'] or 0:9.2f} {result['requests']:9} {result['errors']:7}")
+    return f'{make_url(uri).get_backend_name()}-{label}-c{args.clients}', results
+
+
+# Regressions of `results` against `baseline`, as printable lines
+def regressions(results, baseline, tolerance):
+    found = []
+    for route, result in results.items():
+        if result['errors']:
+            found.append(f"{route}: {result['errors']} of {result['requests']} requests failed")
+        expected = baseline.get(route)
+        if not expected:
+            found.append(f'{route}: no baseline; record one with --save-baseline')
+            continue
+        for metric, direction in CHECKED:
+            value, reference = result[metric], expected.get(metric)
+            if value is None or not reference:
+                continue
+            change = (value - reference) / reference
+            if change * direction > tolerance:
+                found.append(f'{route}: {metric} {value:.2f} vs baseline {reference:.2f} ({change:+.0%})')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--datasets', nargs='+', choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=list(ROUTES))
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10, help='measured time per route')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured time per route')
+    parser.add_argument('--database-url', help='a local MySQL to use instead of a temporary SQLite file')
+    parser.add_argument('--hash-iterations', type=int, default=1000, help='PBKDF2 work factor for login')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baselines')
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    failures = []
+    for label in args.datasets:
+        key, results = run_dataset(label, args)
+        if args.save_baseline:
+            baselines[key] = {**baselines.get(key, {}), **results}
+            continue
+        failures += [f'{key} {line}' for line in regressions(results, baselines.get(key, {}), args.tolerance)]
+
+    if args.save_baseline:
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'\nbaselines written to {args.baselines}')
+    if failures:
+        print('\nREGRESSIONS:')
+        for line in failures:
+            print(f'  {line}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
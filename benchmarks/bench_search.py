@@ -0,0 +1,90 @@
+# Latency of /api/v1/search over N items: exact, mistyped and partial serials and names.
+# Reports index build time and memory, then p50/p95/p99 per query kind.
+# Run from the repo root: python benchmarks/bench_search.py [--rows N] [--queries N]
+import argparse
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app import create_app, db
+from models.items import Item
+from models.users import User
+
+NAMES = ['Laptop', 'Monitor', 'Keyboard', 'Mouse', 'Desk', 'Chair', 'Phone', 'Tablet', 'Headset', 'Dock']
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def mistype(text, rng):
+    i = rng.randrange(len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    app.logger.setLevel(logging.ERROR)
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        for start in range(0, args.rows, 50000):
+            db.session.execute(insert(Item), [
+                {'name': f'{rng.choice(NAMES)} {i % 997}', 'serial_number': f'SN-{i:08d}',
+                 'bill_number': f'BN-{i * 7919 % 100000007:09d}', 'date_of_purchase': date(2023, 1, 1)}
+                for i in range(start, min(start + 50000, args.rows))])
+        admin = User(first_name='Bench', last_name='Admin', phone_no='9000000000',
+                     email='bench.admin@nucleusteq.com', password_hash='x', role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+        search_index = app.extensions['search_index']
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        search_index.build()
+        print(f'index build: {time.perf_counter() - started:.1f} s for {len(search_index.index)} documents, '
+              f'~{(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024:.0f} MB')
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['loggedin'] = True
+        sess['id'] = admin_id
+        sess['role'] = 'admin'
+
+    kinds = {
+        'exact serial': lambda i: f'SN-{i:08d}',
+        'mistyped serial': lambda i: mistype(f'SN-{i:08d}', rng),
+        'serial suffix': lambda i: f'{i:08d}'[-5:],
+        'name': lambda i: f'{rng.choice(NAMES)} {i % 997}',
+    }
+    for label, make_query in kinds.items():
+        samples = []
+        for _ in range(args.queries):
+            query = make_query(rng.randrange(args.rows))
+            started = time.perf_counter()
+            client.get('/api/v1/search', query_string={'q': query})
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f'{label:16} p50 {percentile(samples, 0.5):6.1f} ms  p95 {percentile(samples, 0.95):6.1f} ms  '
+              f'p99 {percentile(samples, 0.99):6.1f} ms')
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import click
+from flask import current_app
+from app import db
+import migrations
+from services.exporter import EXPORT_CHUNK_SIZE, export_items
+from services.importer import CHUNK_SIZE, format_from_filename, import_items, import_users
+from signals import send_items_changed, send_users_changed
+
+
+@click.command('import-items')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=CHUNK_SIZE, show_default=True)
+def import_items_command(path, fmt, chunk_size):
+    """Bulk import items from a CSV or JSONL file."""
+    fmt = fmt or format_from_filename(path)
+    with open(path, newline='', encoding='utf-8') as stream:
+        report = import_items(stream, fmt, chunk_size=chunk_size)
+    if report.inserted:
+        send_items_changed(current_app._get_current_object(), user_ids=report.owner_ids)
+    current_app.logger.info('Bulk item import: %s inserted, %s errors', report.inserted, report.error_count)
+    click.echo(f'Inserted {report.inserted} items, {report.error_count} errors')
+    for error in report.errors:
+        click.echo(f"  row {error['row']}: {error['error']}")
+
+
+@click.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=CHUNK_SIZE, show_default=True)
+@click.option('--workers', type=int, help='Password hashing processes, 0 to hash inline. Defaults to BULK_IMPORT_WORKERS.')
+def import_users_command(path, fmt, chunk_size, workers):
+    """Bulk import users from a CSV or JSONL file."""
+    fmt = fmt or format_from_filename(path)
+    if workers is None:
+        workers = current_app.config.get('BULK_IMPORT_WORKERS')
+    with open(path, newline='', encoding='utf-8') as stream:
+        report = import_users(stream, fmt, chunk_size=chunk_size, workers=workers)
+    if report.inserted:
+        send_users_changed(current_app._get_current_object())
+    current_app.logger.info('Bulk user import: %s inserted, %s errors, %s rows/s',
+                            report.inserted, report.error_count, report.rows_per_second)
+    click.echo(f'Inserted {report.inserted} users, {report.error_count} errors '
+               f'({report.rows_per_second} rows/s)')
+    for error in report.errors:
+        click.echo(f"  row {error['row']}: {error['error']}")
+
+
+@click.command('export-items')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--gzip', 'compress', is_flag=True, default=None, help='Defaults to on for .gz paths.')
+@click.option('--chunk-size', default=EXPORT_CHUNK_SIZE, show_default=True)
+def export_items_command(path, fmt, compress, chunk_size):
+    """Export every item with its owner as CSV or JSONL ('-' for stdout)."""
+    gzipped = path.endswith('.gz')
+    fmt = fmt or format_from_filename(path[:-3] if gzipped else path)
+    compress = gzipped if compress is None else compress
+    written = 0
+    with click.open_file(path, 'wb') as output:
+        for chunk in export_items(fmt, compress=compress, chunk_size=chunk_size):
+            output.write(chunk)
+            written += len(chunk)
+    current_app.logger.info('Item export: %s bytes written to %s', written, path)
+    if path != '-':
+        click.echo(f'Wrote {written} bytes to {path}')
+
+
+@click.group('db')
+def db_group():
+    """Schema migration commands."""
+
+
+@db_group.command('upgrade')
+@click.option('--to', 'target', type=int, help='Stop at this schema version.')
+def db_upgrade_command(target):
+    """Apply pending schema migrations."""
+    applied = migrations.upgrade(db.engine, target=target)
+    for name in applied:
+        click.echo(f'Applied {name}')
+    with db.engine.connect() as connection:
+        click.echo(f'Schema at version {migrations.current_version(connection)}')
+
+
+@db_group.command('current')
+def db_current_command():
+    """Show the current schema version."""
+    with db.engine.connect() as connection:
+        click.echo(migrations.current_version(connection))
+
+
+def register_commands(app):
+    app.cli.add_command(db_group)
+    app.cli.add_command(import_items_command)
+    app.cli.add_command(import_users_command)
+    app.cli.add_command(export_items_command)
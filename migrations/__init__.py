@@ -0,0 +1,79 @@
+from datetime import datetime
+import importlib
+import pkgutil
+from sqlalchemy import func, inspect, select, text
+from app import db
+
+# Lives in the app metadata so create_all/drop_all keep it in step with the other tables
+schema_version = db.Table(
+    'schema_version',
+    db.Column('version', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('name', db.String(100), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False),
+)
+
+
+# Migration modules live in migrations/versions and are named v<NNNN>_<description>.py.
+# Each exposes upgrade(connection) and must be safe to run against a schema that
+# db.create_all() already brought up to date.
+def load_migrations():
+    from migrations import versions
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        if not module_info.name.startswith('v'):
+            continue
+        version = int(module_info.name[1:].split('_', 1)[0])
+        module = importlib.import_module(f'{versions.__name__}.{module_info.name}')
+        migrations.append((version, module_info.name, module))
+    return sorted(migrations, key=lambda migration: migration[0])
+
+
+def current_version(connection):
+    if not inspect(connection).has_table(schema_version.name):
+        return 0
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+# Apply every pending migration in order; returns the names that were applied
+def upgrade(engine, target=None):
+    applied = []
+    with engine.begin() as connection:
+        schema_version.create(connection, checkfirst=True)
+        version = current_version(connection)
+        for number, name, module in load_migrations():
+            if number <= version or (target is not None and number > target):
+                continue
+            module.upgrade(connection)
+            connection.execute(schema_version.insert().values(
+                version=number, name=name, applied_at=datetime.utcnow()))
+            applied.append(name)
+    return applied
+
+
+# Helpers for idempotent migration steps
+def create_table(connection, table):
+    table.create(connection, checkfirst=True)
+
+
+def create_index(connection, index):
+    if index.name not in index_names(connection, index.table.name):
+        index.create(connection)
+
+
+# The inspector skips expression-based indexes, so read their names from the catalog
+INDEX_NAME_QUERIES = {
+    'sqlite': "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table",
+    'mysql': 'SELECT DISTINCT index_name FROM information_schema.statistics '
+             'WHERE table_schema = DATABASE() AND table_name = :table',
+}
+
+
+def index_names(connection, table_name):
+    query = INDEX_NAME_QUERIES.get(connection.dialect.name)
+    if query is None:
+        return {ix['name'] for ix in inspect(connection).get_indexes(table_name)}
+    return set(connection.execute(text(query), {'table': table_name}).scalars())
+
+
+def model_index(model, name):
+    return next(index for index in model.__table__.indexes if index.name == name)
@@ -0,0 +1,8 @@
+from migrations import create_table
+from models.items import Item
+from models.users import User
+
+
+def upgrade(connection):
+    create_table(connection, User.__table__)
+    create_table(connection, Item.__table__)
@@ -0,0 +1,12 @@
+from migrations import create_index, model_index
+from models.items import Item
+from models.users import User
+
+
+# (assigned_to_id, name) is the duplicate-assignment predicate, and its
+# assigned_to_id prefix serves the "my items" and per-user item lookups.
+# The name indexes back the employee typeahead.
+def upgrade(connection):
+    create_index(connection, model_index(Item, 'ix_item_assigned_to_id_name'))
+    create_index(connection, model_index(User, 'ix_user_first_name'))
+    create_index(connection, model_index(User, 'ix_user_last_name'))
@@ -0,0 +1,11 @@
+from models.users import User
+
+
+# Admin access used to be granted by email; the role column now decides it,
+# so existing deployments keep their admin account.
+def upgrade(connection):
+    connection.execute(
+        User.__table__.update()
+        .where(User.__table__.c.email == 'admin@nucleusteq.com')
+        .values(role='admin')
+    )
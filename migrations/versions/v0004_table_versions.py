@@ -0,0 +1,7 @@
+from migrations import create_table
+from services.table_versions import table_version
+
+
+# Change counters behind the ETags of the admin list views
+def upgrade(connection):
+    create_table(connection, table_version)
@@ -0,0 +1,8 @@
+from migrations import create_table
+from models.assignment_events import AssignmentEvent
+
+
+# Append-only assignment history; its (item_id, occurred_at) and (user_id, occurred_at)
+# indexes are created with the table
+def upgrade(connection):
+    create_table(connection, AssignmentEvent.__table__)
@@ -0,0 +1,10 @@
+from migrations import create_index, model_index
+from models.items import Item
+
+
+# Indexes behind the filtered item pages: (name, id) for name-prefix searches and
+# ((assigned_to_id IS NOT NULL), id) for the assigned/unassigned filters. The second
+# is a functional index, which MySQL supports from 8.0.13.
+def upgrade(connection):
+    create_index(connection, model_index(Item, 'ix_item_name_id'))
+    create_index(connection, model_index(Item, 'ix_item_assigned_id'))
@@ -0,0 +1,80 @@
+from collections import defaultdict
+from datetime import datetime
+from app import db
+from sqlalchemy import func, insert, select
+
+
+# Append-only history of who held each item. One row per change of holder,
+# user_id None meaning the item was handed back (unassigned, deleted, owner removed).
+# No foreign keys, so the history outlives the items and users it mentions.
+class AssignmentEvent(db.Model):
+    __tablename__ = 'assignment_event'
+    __table_args__ = (
+        db.Index('ix_assignment_event_item_id_occurred_at', 'item_id', 'occurred_at'),
+        db.Index('ix_assignment_event_user_id_occurred_at', 'user_id', 'occurred_at'),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    item_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    actor_id = db.Column(db.Integer, nullable=True)
+
+    @staticmethod
+    def rows(moves, actor_id=None):
+        now = datetime.utcnow()
+        return [{'item_id': item_id, 'user_id': user_id, 'occurred_at': now, 'actor_id': actor_id}
+                for item_id, user_id in moves.items()]
+
+    # Add events for {item_id: new holder or None} to the current transaction; call before the mutation's commit
+    @classmethod
+    def record(cls, moves, actor_id=None):
+        if moves:
+            # Core insert: one executemany even when some rows have NULL holders
+            db.session.execute(insert(cls.__table__), cls.rows(moves, actor_id))
+
+    # Holding intervals of the given items over [start, end):
+    # {item_id: [(user_id, held_from, held_until)]}, held_until None if still held at `end`. Two index range scans:
+    # the last event at or before `start` per item, then the events inside the range.
+    @classmethod
+    def holdings(cls, item_ids, start, end):
+        item_ids = list(item_ids)
+        if not item_ids:
+            return {}
+        latest = (select(func.max(cls.id))
+                  .where(cls.item_id.in_(item_ids), cls.occurred_at <= start)
+                  .group_by(cls.item_id))
+        columns = (cls.item_id, cls.user_id, cls.occurred_at)
+        opening = db.session.execute(select(*columns).where(cls.id.in_(latest)))
+        changes = db.session.execute(
+            select(*columns)
+            .where(cls.item_id.in_(item_ids), cls.occurred_at > start, cls.occurred_at < end)
+            .order_by(cls.item_id, cls.occurred_at, cls.id))
+
+        events = defaultdict(list)
+        for item_id, user_id, occurred_at in list(opening) + list(changes):
+            events[item_id].append((user_id, occurred_at))
+        intervals = {}
+        for item_id, item_events in events.items():
+            spans = []
+            for (user_id, held_from), following in zip(item_events, item_events[1:] + [(None, None)]):
+                if user_id is not None:
+                    spans.append((user_id, held_from, following[1]))
+            intervals[item_id] = spans
+        return intervals
+
+    # Who held `item_id` at any point in [start, end), oldest first
+    @classmethod
+    def holders(cls, item_id, start, end):
+        return cls.holdings([item_id], start, end).get(item_id, [])
+
+    # What `user_id` held at any point in [start, end): [(item_id, held_from, held_until)]
+    @classmethod
+    def held_by(cls, user_id, start, end):
+        item_ids = db.session.scalars(
+            select(cls.item_id).where(cls.user_id == user_id, cls.occurred_at < end).distinct())
+        held = [(item_id, held_from, held_until)
+                for item_id, spans in cls.holdings(item_ids, start, end).items()
+                for holder, held_from, held_until in spans
+                if holder == user_id]
+        return sorted(held, key=lambda span: (span[1], span[0]))
@@ -1,9 +1,16 @@
 from app import db
-from sqlalchemy.orm import relationship
+from sqlalchemy import or_, select
+from sqlalchemy.orm import relationship, backref, joinedload
+from utils.query import PREFIX_END, prefix_pattern
 
 
 
 class Item(db.Model):
+    __table_args__ = (
+        db.Index('ix_item_assigned_to_id_name', 'assigned_to_id', 'name'),
+        db.Index('ix_item_name_id', 'name', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(100), nullable=False)
     serial_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -11,7 +18,67 @@ class Item(db.Model):
     date_of_purchase = db.Column(db.Date, nullable=False)
     warranty = db.Column(db.String(50), nullable=True)
     assigned_to_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    assigned_to = relationship('User')
+    # Back-reference stays lazy; list views opt into batched loading with selectinload
+    assigned_to = relationship('User', backref=backref('items', lazy='select'))
 
     def __repr__(self):
         return f"Item(name='{self.name}', serial_number='{self.serial_number}', bill_number='{self.bill_number}')"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'serial_number': self.serial_number,
+            'bill_number': self.bill_number,
+            'date_of_purchase': str(self.date_of_purchase),
+            'warranty': self.warranty,
+            'assigned_to_id': self.assigned_to_id,
+        }
+
+    @classmethod
+    def page_query(cls, status=None, owner_id=None, name_prefix=None, after_id=None, limit=50, columns=None):
+        # Keyset pagination on id: every page is an index range scan of `limit` rows,
+        # no matter how deep into the table the cursor is.
+        # With `columns` the page is plain rows of those columns instead of Items.
+        if columns:
+            query = select(*columns)
+        else:
+            query = select(cls).options(joinedload(cls.assigned_to))
+        # Status pages read ix_item_assigned_id in id order, matching its expression exactly
+        if status == 'assigned':
+            query = query.where(IS_ASSIGNED == 1)
+        elif status == 'unassigned':
+            query = query.where(IS_ASSIGNED == 0)
+        if owner_id is not None:
+            query = query.where(cls.assigned_to_id == owner_id)
+        if not name_prefix:
+            if after_id is not None:
+                query = query.where(cls.id > after_id)
+            # Fetch one extra row to know whether another page exists
+            return query.order_by(cls.id).limit(limit + 1)
+
+        # Name searches page through ix_item_name_id in (name, id) order, so a page reads
+        # `limit` index entries however rare the prefix is. The explicit bounds let every
+        # dialect seek (SQLite's case-insensitive LIKE alone cannot use the index); the
+        # cursor item's name is looked up by id so the cursor stays a plain id.
+        query = query.where(cls.name >= name_prefix, cls.name < name_prefix + PREFIX_END,
+                            cls.name.like(prefix_pattern(name_prefix), escape='\\'))
+        if after_id is not None:
+            after_name = select(cls.name).where(cls.id == after_id).correlate(None).scalar_subquery()
+            query = query.where(cls.name >= after_name, or_(cls.name > after_name, cls.id > after_id))
+        return query.order_by(cls.name, cls.id).limit(limit + 1)
+
+    @staticmethod
+    def split_page(items, limit):
+        next_cursor = items[limit - 1].id if len(items) > limit else None
+        return items[:limit], next_cursor
+
+    @classmethod
+    def page(cls, status=None, owner_id=None, name_prefix=None, after_id=None, limit=50):
+        items = db.session.scalars(cls.page_query(status, owner_id, name_prefix, after_id, limit)).all()
+        return cls.split_page(items, limit)
+
+
+# 1 for assigned items, 0 for unassigned ones; indexed with id so either status pages in id order
+IS_ASSIGNED = Item.assigned_to_id.isnot(None)
+db.Index('ix_item_assigned_id', IS_ASSIGNED, Item.id)
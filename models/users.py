@@ -1,11 +1,20 @@
 import re
+from flask import current_app
+from sqlalchemy import select
 from app import db
+from utils.query import prefix_pattern
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# Module-level so it can be shipped to worker processes for bulk hashing
+def hash_password(password, iterations=None):
+    # Use SHA-256 and shorter salt (salt_length=8) to keep hashes short
+    method = f'pbkdf2:sha256:{iterations}' if iterations else 'pbkdf2:sha256'
+    return generate_password_hash(password, method=method, salt_length=8)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    first_name = db.Column(db.String(50), nullable=False)
-    last_name = db.Column(db.String(50), nullable=False)
+    first_name = db.Column(db.String(50), nullable=False, index=True)
+    last_name = db.Column(db.String(50), nullable=False, index=True)
     dob = db.Column(db.Date, nullable=True)
     phone_no = db.Column(db.String(15), unique=True, nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
@@ -18,8 +27,7 @@ class User(db.Model):
 
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256', salt_length=8)  # Use SHA-256 and shorter salt
-        # Adjust salt_length to generate shorter hashes, e.g., salt_length=8
+        self.password_hash = hash_password(password, current_app.config['PASSWORD_HASH_ITERATIONS'])
 
     def verify_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -29,3 +37,28 @@ class User(db.Model):
         # Simple regex for email validation
         pattern = r"^[a-zA-Z][a-zA-Z0-9_.]*@nucleusteq\.com$"
         return re.match(pattern, email) is not None
+
+    @staticmethod
+    def is_valid_phone(phone_no):
+        return len(phone_no) == 10 and phone_no.isdigit()
+
+    SEARCH_COLUMNS = ('first_name', 'last_name', 'email')
+
+    @classmethod
+    def search_prefix_query(cls, column, prefix, limit=10):
+        # One bounded query per indexed column, so each lookup is an index range scan
+        column = getattr(cls, column)
+        return (select(cls.id, cls.first_name, cls.last_name, cls.email)
+                .where(column.like(prefix_pattern(prefix), escape='\\'))
+                .order_by(column)
+                .limit(limit))
+
+    @classmethod
+    def search_prefix(cls, prefix, limit=10):
+        results = {}
+        for column in cls.SEARCH_COLUMNS:
+            for row in db.session.execute(cls.search_prefix_query(column, prefix, limit)):
+                results.setdefault(row.id, dict(row._mapping))
+            if len(results) >= limit:
+                break
+        return list(results.values())[:limit]
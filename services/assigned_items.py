@@ -0,0 +1,24 @@
+from flask import current_app
+from models.items import Item
+from signals import items_changed
+
+
+def cache_key(user_id):
+    return f'assigned_items:{user_id}'
+
+
+# Items held by `user_id` as dicts, served from the assigned-items cache when possible
+def get_assigned_items(user_id):
+    cache = current_app.extensions['assigned_items_cache']
+    items = cache.get(cache_key(user_id))
+    if items is None:
+        items = [item.to_dict() for item in Item.query.filter_by(assigned_to_id=user_id).order_by(Item.id)]
+        cache.set(cache_key(user_id), items)
+    return items
+
+
+@items_changed.connect
+def invalidate_assigned_items(app, user_ids, item_ids=None):
+    cache = app.extensions['assigned_items_cache']
+    for user_id in user_ids:
+        cache.delete(cache_key(user_id))
@@ -0,0 +1,99 @@
+from collections import defaultdict
+from sqlalchemy import func, select, update
+from app import db
+from models.assignment_events import AssignmentEvent
+from models.items import Item
+from models.users import User
+
+MAX_BATCH_SIZE = 1000
+
+
+# Turn the request payload into [(item_id, user_id or None)], raising ValueError on bad input
+def parse_pairs(payload):
+    if not isinstance(payload, list):
+        raise ValueError('assignments must be a list')
+    if len(payload) > MAX_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_BATCH_SIZE} assignments per batch')
+    pairs = []
+    for entry in payload:
+        if isinstance(entry, dict):
+            item_id, user_id = entry.get('item_id'), entry.get('user_id')
+        elif isinstance(entry, (list, tuple)) and len(entry) == 2:
+            item_id, user_id = entry
+        else:
+            raise ValueError('Each assignment must be {"item_id", "user_id"} or [item_id, user_id]')
+        # int(True) is 1, so a JSON true would otherwise name item or user 1
+        if isinstance(item_id, bool) or isinstance(user_id, bool):
+            raise ValueError('item_id and user_id must be integers')
+        try:
+            item_id = int(item_id)
+            user_id = int(user_id) if user_id not in (None, '') else None
+        except (TypeError, ValueError):
+            raise ValueError('item_id and user_id must be integers')
+        pairs.append((item_id, user_id))
+    return pairs
+
+
+# Validate and apply a batch of (item_id, user_id|None) moves in one transaction,
+# together with their assignment events. Returns one result dict per pair, in input order, and the ids of every previous or
+# new owner whose items changed.
+def apply_assignments(pairs, actor_id=None):
+    item_ids = {item_id for item_id, _ in pairs}
+    target_ids = {user_id for _, user_id in pairs if user_id is not None}
+
+    items = {row.id: row for row in db.session.execute(
+        select(Item.id, Item.name, Item.assigned_to_id).where(Item.id.in_(item_ids)))}
+    users = set(db.session.scalars(select(User.id).where(User.id.in_(target_ids)))) if target_ids else set()
+
+    # How many items of each name every target user already holds, in one grouped query
+    holdings = defaultdict(int)
+    if users:
+        for user_id, name, count in db.session.execute(
+                select(Item.assigned_to_id, Item.name, func.count())
+                .where(Item.assigned_to_id.in_(users))
+                .group_by(Item.assigned_to_id, Item.name)):
+            holdings[user_id, name] = count
+
+    results = [None] * len(pairs)
+    moves = {}
+    owner_ids = set()
+    # Repeats are judged in input order (the first occurrence is applied), before sorting
+    first_index = {}
+    for index, (item_id, _) in enumerate(pairs):
+        first_index.setdefault(item_id, index)
+    # Unassignments first, so items handed back in this batch free their slot for a new owner
+    order = sorted(range(len(pairs)), key=lambda index: pairs[index][1] is not None)
+    for index in order:
+        item_id, user_id = pairs[index]
+        item = items.get(item_id)
+        error = None
+        if item is None:
+            error = 'Item not found'
+        elif first_index[item_id] != index:
+            error = 'Item appears more than once in the batch'
+        elif user_id is not None and user_id not in users:
+            error = 'User not found'
+        elif user_id is not None and user_id != item.assigned_to_id and holdings[user_id, item.name]:
+            error = f'User already has an item named {item.name}'
+
+        if error:
+            results[index] = {'item_id': item_id, 'user_id': user_id, 'success': False, 'error': error}
+            continue
+        if user_id != item.assigned_to_id:
+            if item.assigned_to_id is not None:
+                holdings[item.assigned_to_id, item.name] -= 1
+            if user_id is not None:
+                holdings[user_id, item.name] += 1
+            moves[item_id] = user_id
+            owner_ids.update({item.assigned_to_id, user_id} - {None})
+        results[index] = {'item_id': item_id, 'user_id': user_id, 'success': True}
+
+    # One UPDATE per distinct target, then a single commit for the whole batch
+    by_target = defaultdict(list)
+    for item_id, user_id in moves.items():
+        by_target[user_id].append(item_id)
+    for user_id, ids in by_target.items():
+        db.session.execute(update(Item).where(Item.id.in_(ids)).values(assigned_to_id=user_id))
+    AssignmentEvent.record(moves, actor_id=actor_id)
+    db.session.commit()
+    return results, owner_ids
@@ -0,0 +1,78 @@
+import csv
+import io
+import zlib
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from models.items import Item
+from models.users import User
+from utils.serialize import dumps
+
+EXPORT_CHUNK_SIZE = 1000
+
+# Asset register columns: each item with its owner, joined in SQL
+EXPORT_COLUMNS = (
+    Item.id,
+    Item.name,
+    Item.serial_number,
+    Item.bill_number,
+    Item.date_of_purchase,
+    Item.warranty,
+    Item.assigned_to_id,
+    User.first_name.label('owner_first_name'),
+    User.last_name.label('owner_last_name'),
+    User.email.label('owner_email'),
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+def export_query():
+    return select(*EXPORT_COLUMNS).outerjoin(User, Item.assigned_to_id == User.id).order_by(Item.id)
+
+
+# Long exports read from a replica when one is healthy
+def export_engine():
+    router = current_app.extensions.get('replica_router')
+    return (router.choose() if router else None) or db.engine
+
+
+# Lists of rows, `chunk_size` at a time, from a server-side cursor
+def export_rows(chunk_size=EXPORT_CHUNK_SIZE):
+    with export_engine().connect() as connection:
+        result = connection.execution_options(yield_per=chunk_size).execute(export_query())
+        for partition in result.partitions():
+            yield partition
+
+
+def csv_chunks(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def jsonl_chunks(partitions):
+    for rows in partitions:
+        yield b''.join(dumps(dict(zip(EXPORT_FIELDS, row))) + b'\n' for row in rows)
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+# The whole inventory as CSV or JSONL byte chunks; memory use is bounded by one chunk
+def export_items(fmt, compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    encode = jsonl_chunks if fmt == 'jsonl' else csv_chunks
+    chunks = encode(export_rows(chunk_size))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,61 @@
+from flask import current_app
+from markupsafe import Markup
+from signals import items_changed, users_changed
+from utils.metrics import template_timer
+
+
+# Everything an item card shows; any change to it is a new version of the row
+def item_version(item):
+    owner = item.assigned_to
+    return (item.name, item.serial_number, item.bill_number, str(item.date_of_purchase), item.warranty,
+            owner and (owner.id, owner.first_name, owner.last_name))
+
+
+def user_version(user):
+    return (user.first_name, user.last_name, str(user.dob), user.phone_no, user.email, user.role,
+            tuple((item.id, item.name) for item in user.items))
+
+
+# Rendered HTML per row, cached as (row_id, version) -> html with one entry per row.
+# The version is compared on every lookup, so rows changed by another worker are
+# re-rendered too; the signal receivers below only free entries early.
+def render_rows(kind, template_name, rows, version_of):
+    cache = current_app.extensions['row_fragments']
+    template = None
+    fragments = []
+    for row in rows:
+        key = (kind, row.id)
+        version = version_of(row)
+        entry = cache.get(key)
+        if entry is None or entry[0] != version:
+            template = template or current_app.jinja_env.get_template(template_name)
+            with template_timer():
+                entry = (version, Markup(template.render({kind: row})))
+            cache.set(key, entry)
+        fragments.append(entry[1])
+    return fragments
+
+
+def item_cards(items):
+    return render_rows('item', 'item_card.html', items, item_version)
+
+
+def user_cards(users):
+    return render_rows('user', 'user_card.html', users, user_version)
+
+
+@items_changed.connect
+def drop_item_fragments(app, user_ids, item_ids=None):
+    cache = app.extensions['row_fragments']
+    for item_id in item_ids or ():
+        cache.delete(('item', item_id))
+    # The owners' cards list their items
+    for user_id in user_ids:
+        cache.delete(('user', user_id))
+
+
+@users_changed.connect
+def drop_user_fragments(app, user_ids):
+    cache = app.extensions['row_fragments']
+    for user_id in user_ids:
+        cache.delete(('user', user_id))
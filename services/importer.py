@@ -0,0 +1,316 @@
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from datetime import datetime
+from itertools import islice
+import json
+import time
+from flask import current_app
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models.assignment_events import AssignmentEvent
+from models.items import Item
+from models.users import User, hash_password
+from services.passwords import HashingPoolSaturated
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+# Yield (line_number, row, error) from a CSV or JSONL text stream without reading it all
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, None, 'Invalid JSON'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Row must be a JSON object'
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def format_from_filename(filename):
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+        self.owner_ids = set()
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, line_number, error):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line_number, 'error': error})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        processed = self.inserted + self.error_count
+        return round(processed / self.elapsed, 1) if self.elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': self.rows_per_second,
+        }
+
+
+def clean_value(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+# Validate one item row in isolation, returning (values, error)
+def parse_item_row(row):
+    values = {key: clean_value(row, key) for key in ('name', 'serial_number', 'bill_number', 'warranty')}
+    if not all([values['name'], values['serial_number'], values['bill_number']]):
+        return None, 'name, serial_number and bill_number are required'
+
+    try:
+        purchase_date = datetime.strptime(clean_value(row, 'date_of_purchase') or '', '%Y-%m-%d')
+    except ValueError:
+        return None, 'Invalid date format'
+    if purchase_date > datetime.now():
+        return None, 'Date of purchase cannot be in the future'
+    values['date_of_purchase'] = purchase_date.date()
+
+    assigned_to_id = clean_value(row, 'assigned_to_id')
+    if assigned_to_id is not None:
+        if not assigned_to_id.isdigit():
+            return None, 'assigned_to_id must be a user id'
+        assigned_to_id = int(assigned_to_id)
+    values['assigned_to_id'] = assigned_to_id
+    return values, None
+
+
+def import_items_chunk(chunk, report):
+    candidates, errors = [], []
+    for line_number, row, error in chunk:
+        if error is None:
+            values, error = parse_item_row(row)
+        if error:
+            errors.append((line_number, error))
+        else:
+            candidates.append((line_number, values))
+    rows = check_item_chunk(candidates, errors) if candidates else []
+    for line_number, error in sorted(errors):
+        report.add_error(line_number, error)
+    if not rows:
+        return
+
+    try:
+        db.session.execute(insert(Item), [values for _, values in rows])
+        record_initial_owners(rows)
+        db.session.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent writer; report the chunk rather than guess which row
+        db.session.rollback()
+        for line_number, _ in rows:
+            report.add_error(line_number, 'Conflicting item inserted concurrently')
+        return
+    report.inserted += len(rows)
+    report.owner_ids.update(values['assigned_to_id'] for _, values in rows if values['assigned_to_id'] is not None)
+
+
+# Bulk inserts return no ids, so the assigned rows are looked up by serial to start their history
+def record_initial_owners(rows):
+    owners = {values['serial_number']: values['assigned_to_id'] for _, values in rows
+              if values['assigned_to_id'] is not None}
+    if owners:
+        AssignmentEvent.record(dict(
+            (item_id, owners[serial_number]) for item_id, serial_number in db.session.execute(
+                select(Item.id, Item.serial_number).where(Item.serial_number.in_(owners)))))
+
+
+# Check a chunk of parsed rows against the table and each other, returning the insertable ones
+def check_item_chunk(candidates, errors):
+    # One round trip for serial/bill uniqueness and one for owners across the whole chunk
+    serials = {values['serial_number'] for _, values in candidates}
+    bills = {values['bill_number'] for _, values in candidates}
+    taken_serials, taken_bills = set(), set()
+    for serial_number, bill_number in db.session.execute(
+            select(Item.serial_number, Item.bill_number)
+            .where(or_(Item.serial_number.in_(serials), Item.bill_number.in_(bills)))):
+        taken_serials.add(serial_number)
+        taken_bills.add(bill_number)
+
+    owner_ids = {values['assigned_to_id'] for _, values in candidates if values['assigned_to_id'] is not None}
+    known_owners = set()
+    if owner_ids:
+        known_owners = set(db.session.scalars(select(User.id).where(User.id.in_(owner_ids))))
+
+    rows = []
+    for line_number, values in candidates:
+        if values['serial_number'] in taken_serials:
+            errors.append((line_number, 'Serial number already exists'))
+        elif values['bill_number'] in taken_bills:
+            errors.append((line_number, 'Bill number already exists'))
+        elif values['assigned_to_id'] is not None and values['assigned_to_id'] not in known_owners:
+            errors.append((line_number, 'Assigned user not found'))
+        else:
+            # Later rows in the same file must not reuse these numbers either
+            taken_serials.add(values['serial_number'])
+            taken_bills.add(values['bill_number'])
+            rows.append((line_number, values))
+    return rows
+
+
+# Stream items from `stream` into the database one chunk at a time
+def import_items(stream, fmt, chunk_size=CHUNK_SIZE):
+    report = ImportReport()
+    for chunk in chunked(read_rows(stream, fmt), chunk_size):
+        import_items_chunk(chunk, report)
+    return report.finish()
+
+
+# Validate one user row with the same rules as add_user, returning (values, error)
+def parse_user_row(row):
+    values = {key: clean_value(row, key) for key in ('first_name', 'last_name', 'phone_no', 'email')}
+    password = row.get('password') or ''
+    if not all(values.values()) or not password:
+        return None, 'first_name, last_name, phone_no, email and password are required'
+    if not User.is_valid_email(values['email']):
+        return None, 'Invalid email address'
+    if len(password) < 6:
+        return None, 'Password must be at least 6 characters long'
+    if not User.is_valid_phone(values['phone_no']):
+        return None, 'Phone number must be a 10-digit number'
+
+    dob = clean_value(row, 'dob')
+    if dob is not None:
+        try:
+            dob = datetime.strptime(dob, '%Y-%m-%d')
+        except ValueError:
+            return None, 'Invalid date format for Date of Birth'
+        if dob > datetime.now():
+            return None, 'Date of Birth cannot be in the future'
+        dob = dob.date()
+    values['dob'] = dob
+    values['role'] = clean_value(row, 'role') or 'user'
+    if values['role'] not in current_app.extensions['permissions']:
+        return None, 'Unknown role'
+    values['password'] = password
+    return values, None
+
+
+# Check a chunk of parsed users for taken emails/phones in a single query
+def check_user_chunk(candidates, errors):
+    emails = {values['email'] for _, values in candidates}
+    phones = {values['phone_no'] for _, values in candidates}
+    taken_emails, taken_phones = set(), set()
+    for email, phone_no in db.session.execute(
+            select(User.email, User.phone_no)
+            .where(or_(User.email.in_(emails), User.phone_no.in_(phones)))):
+        taken_emails.add(email)
+        taken_phones.add(phone_no)
+
+    rows = []
+    for line_number, values in candidates:
+        if values['email'] in taken_emails:
+            errors.append((line_number, 'Email already exists'))
+        elif values['phone_no'] in taken_phones:
+            errors.append((line_number, 'Phone number already exists'))
+        else:
+            taken_emails.add(values['email'])
+            taken_phones.add(values['phone_no'])
+            rows.append((line_number, values))
+    return rows
+
+
+def import_users_chunk(chunk, report, hash_passwords):
+    candidates, errors = [], []
+    for line_number, row, error in chunk:
+        if error is None:
+            values, error = parse_user_row(row)
+        if error:
+            errors.append((line_number, error))
+        else:
+            candidates.append((line_number, values))
+    rows = check_user_chunk(candidates, errors) if candidates else []
+    for line_number, error in sorted(errors):
+        report.add_error(line_number, error)
+    if not rows:
+        return
+
+    try:
+        hashes = hash_passwords([values.pop('password') for _, values in rows])
+    except HashingPoolSaturated:
+        for line_number, _ in rows:
+            report.add_error(line_number, 'Password hashing busy, import this row again')
+        return
+    for (_, values), password_hash in zip(rows, hashes):
+        values['password_hash'] = password_hash
+
+    try:
+        db.session.execute(insert(User), [values for _, values in rows])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        for line_number, _ in rows:
+            report.add_error(line_number, 'Conflicting user inserted concurrently')
+        return
+    report.inserted += len(rows)
+
+
+# Stream users from `stream` into the database. PBKDF2 dominates the cost of a user row:
+# requests pass the app's shared HashingPool, the CLI hashes on its own `workers` processes.
+def import_users(stream, fmt, chunk_size=CHUNK_SIZE, workers=None, pool=None):
+    report = ImportReport()
+    executor = None
+    if pool is not None:
+        hash_passwords = pool.hash_many
+    else:
+        iterations = current_app.config['PASSWORD_HASH_ITERATIONS']
+        if workers != 0:
+            executor = ProcessPoolExecutor(max_workers=workers)
+
+        def hash_passwords(passwords):
+            iterations_list = [iterations] * len(passwords)
+            if executor is None:
+                return list(map(hash_password, passwords, iterations_list))
+            return list(executor.map(hash_password, passwords, iterations_list,
+                                     chunksize=max(1, len(passwords) // 64)))
+    try:
+        for chunk in chunked(read_rows(stream, fmt), chunk_size):
+            import_users_chunk(chunk, report, hash_passwords)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return report.finish()
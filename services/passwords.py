@@ -0,0 +1,80 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import check_password_hash
+from models.users import hash_password
+
+
+class HashingPoolSaturated(Exception):
+    pass
+
+
+# PBKDF2 hashing and verification off the request thread. At most `max_pending`
+# jobs may be queued or running; past that callers get HashingPoolSaturated
+# straight away instead of waiting behind the burst. workers=0 hashes inline.
+class HashingPool:
+    def __init__(self, workers=None, max_pending=32, iterations=None):
+        self.executor = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+        self.batch_size = workers or os.cpu_count() or 1
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.iterations = iterations
+        self.rejected = 0
+
+    def run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingPoolSaturated()
+        try:
+            if self.executor is None:
+                return fn(*args)
+            return self.executor.submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        return self.run(hash_password, password, self.iterations)
+
+    def verify(self, password_hash, password):
+        return self.run(check_password_hash, password_hash, password)
+
+    # Bulk hashing for imports, one batch per worker count at a time. Each batch holds a
+    # single slot, so logins queued meanwhile run between batches instead of behind the
+    # whole file. Waits up to `timeout` seconds for a slot rather than failing at once.
+    def hash_many(self, passwords, timeout=30):
+        hashes = []
+        for start in range(0, len(passwords), self.batch_size):
+            batch = passwords[start:start + self.batch_size]
+            if not self.slots.acquire(timeout=timeout):
+                self.rejected += 1
+                raise HashingPoolSaturated()
+            try:
+                if self.executor is None:
+                    hashes += [hash_password(password, self.iterations) for password in batch]
+                else:
+                    hashes += self.executor.map(hash_password, batch, [self.iterations] * len(batch))
+            finally:
+                self.slots.release()
+        return hashes
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+# True when `password_hash` was made with another method or work factor than the current one
+def needs_rehash(password_hash, iterations):
+    method = password_hash.split('$', 1)[0]
+    return method != f'pbkdf2:sha256:{iterations}'
+
+
+def make_hashing_pool(config):
+    return HashingPool(
+        workers=config['PASSWORD_HASH_WORKERS'],
+        max_pending=config['PASSWORD_HASH_MAX_PENDING'],
+        iterations=config['PASSWORD_HASH_ITERATIONS'],
+    )
+
+
+def hashing_pool():
+    return current_app.extensions['password_hashing']
@@ -0,0 +1,204 @@
+import threading
+import time
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from models.items import Item
+from models.users import User
+from services.table_versions import read_versions
+from signals import items_changed, users_changed
+from utils.query import prefix_pattern
+from utils.trigrams import TrigramIndex
+
+SEARCH_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+LOAD_CHUNK_SIZE = 10000
+# Queued changes past this drop the index instead; the next search rebuilds it
+MAX_PENDING_CHANGES = 10000
+
+# Searchable fields per document type; every source starts with the row id
+SEARCH_FIELDS = {
+    'item': ('name', 'serial_number', 'bill_number'),
+    'user': ('first_name', 'last_name', 'email'),
+}
+SEARCH_SOURCES = {
+    'item': [Item.__table__.c.id] + [Item.__table__.c[name] for name in SEARCH_FIELDS['item']],
+    'user': [User.__table__.c.id] + [User.__table__.c[name] for name in SEARCH_FIELDS['user']],
+}
+# Indexed columns the prefix fallback may search
+PREFIX_COLUMNS = {
+    'item': (Item.__table__.c.serial_number, Item.__table__.c.bill_number),
+    'user': tuple(User.__table__.c[name] for name in User.SEARCH_COLUMNS),
+}
+
+
+def load_rows(connection, kind, where=None):
+    query = select(*SEARCH_SOURCES[kind])
+    if where is not None:
+        query = query.where(where)
+    return connection.execution_options(yield_per=LOAD_CHUNK_SIZE).execute(query)
+
+
+# Per-app trigram index over items and users, built in the background on first use;
+# until it is ready search() returns None and callers fall back to prefix queries.
+# Mutations in this process reach it through items_changed/users_changed, which only
+# queue the changed ids: the next search re-reads them, so writers never wait on it.
+# Changes made by other workers show up as table versions (services.table_versions)
+# this index has not seen; it then rebuilds, at most once per `rebuild_interval`.
+class SearchIndex:
+    def __init__(self, rebuild_interval=300):
+        self.rebuild_interval = rebuild_interval
+        self.index = None
+        self.versions = {}
+        self.local_changes = {}
+        self.max_ids = {}
+        self.checked_at = 0
+        self.rebuild_thread = None
+        self.building = False
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def build(self):
+        # Drop the old index first so a rebuild never holds two copies; changes queued
+        # from here on are applied to the new one, earlier ones are in the rows it loads
+        with self._lock:
+            self.index = None
+            self.building = True
+            self._pending = []
+        try:
+            # Versions first: a change that lands while rows load makes the index look stale, never fresh
+            versions = read_versions(*SEARCH_SOURCES)
+            index = TrigramIndex()
+            max_ids = {}
+            with db.engine.connect() as connection:
+                for kind in SEARCH_SOURCES:
+                    max_ids[kind] = 0
+                    for row in load_rows(connection, kind):
+                        index.add((kind, row[0]), row[1:], tuple(row[1:]))
+                        max_ids[kind] = max(max_ids[kind], row[0])
+        except Exception:
+            self.building = False
+            raise
+        with self._lock:
+            self.versions, self.max_ids = versions, max_ids
+            self.local_changes = dict.fromkeys(SEARCH_SOURCES, 0)
+            self.checked_at = time.monotonic()
+            self.index = index
+            self.building = False
+
+    def _build_in_background(self, app):
+        try:
+            with app.app_context():
+                self.build()
+        except Exception:
+            app.logger.exception('Search index rebuild failed')
+        finally:
+            self.rebuild_thread = None
+
+    def rebuild_async(self):
+        with self._lock:
+            if self.rebuild_thread:
+                return self.rebuild_thread
+            thread = self.rebuild_thread = threading.Thread(
+                target=self._build_in_background, args=(current_app._get_current_object(),), daemon=True)
+        thread.start()
+        return thread
+
+    # Queue rows to re-read (None: rows added past the highest indexed id)
+    def mark_changed(self, kind, ids):
+        with self._lock:
+            if self.index is None and not self.building:
+                return
+            if len(self._pending) >= MAX_PENDING_CHANGES:
+                # Dropped changes are never counted as local, so a build already
+                # under way is caught by the version check and rebuilt again
+                self.index, self._pending = None, []
+                return
+            self._pending.append((kind, ids))
+
+    # Re-read the queued rows, one query per kind however many changes were queued
+    def apply_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        merged = {}
+        for kind, ids in pending:
+            row_ids, changes = merged.get((kind, ids is None), (set(), 0))
+            merged[kind, ids is None] = row_ids | set(ids or ()), changes + 1
+        for (kind, new_rows), (row_ids, changes) in merged.items():
+            self.refresh(kind, None if new_rows else row_ids, changes)
+
+    def refresh(self, kind, ids, changes=1):
+        index = self.index
+        if index is None:
+            # A rebuild started since the change was queued; keep it for the new index
+            self.mark_changed(kind, ids)
+            return
+        rows = []
+        if ids is None or ids:
+            id_column = SEARCH_SOURCES[kind][0]
+            where = id_column > self.max_ids[kind] if ids is None else id_column.in_(ids)
+            with db.engine.connect() as connection:
+                rows = load_rows(connection, kind, where).all()
+        for row in rows:
+            index.add((kind, row[0]), row[1:], tuple(row[1:]))
+        for missing in set(ids or ()) - {row[0] for row in rows}:
+            index.remove((kind, missing))
+        with self._lock:
+            if rows:
+                self.max_ids[kind] = max(self.max_ids[kind], max(row[0] for row in rows))
+            self.local_changes[kind] += changes
+
+    def is_stale(self):
+        versions = read_versions(*SEARCH_SOURCES)
+        return any(versions[kind] > self.versions[kind] + self.local_changes[kind] for kind in versions)
+
+    def search(self, query, limit=SEARCH_LIMIT, kinds=tuple(SEARCH_SOURCES)):
+        index = self.index
+        if index is None:
+            self.rebuild_async()
+            return None
+        self.apply_pending()
+        if time.monotonic() - self.checked_at >= self.rebuild_interval and not self.rebuild_thread:
+            self.checked_at = time.monotonic()
+            if self.is_stale():
+                self.rebuild_async()
+        kinds = frozenset(kinds)
+        return index.search(query, limit, accept=lambda key: key[0] in kinds)
+
+
+# Indexed prefix lookups while the trigram index is building: exact prefixes only, no score
+def search_prefix(query, limit, kinds):
+    results = {}
+    for kind in SEARCH_SOURCES:
+        if kind not in kinds:
+            continue
+        for column in PREFIX_COLUMNS[kind]:
+            rows = db.session.execute(select(*SEARCH_SOURCES[kind])
+                                      .where(column.like(prefix_pattern(query), escape='\\'))
+                                      .order_by(column).limit(limit))
+            for row in rows:
+                results.setdefault((kind, row[0]), dict(zip(SEARCH_FIELDS[kind], row[1:]),
+                                                        type=kind, id=row[0], score=None))
+            if len(results) >= limit:
+                return list(results.values())[:limit]
+    return list(results.values())
+
+
+# Top `limit` items/users for `query` as dicts, best match first
+def search(query, limit=SEARCH_LIMIT, kinds=tuple(SEARCH_SOURCES)):
+    results = current_app.extensions['search_index'].search(query, limit, kinds)
+    if results is None:
+        return search_prefix(query, limit, kinds)
+    return [dict(zip(SEARCH_FIELDS[kind], payload), type=kind, id=row_id, score=round(score, 3))
+            for score, (kind, row_id), payload in results]
+
+
+@items_changed.connect
+def refresh_item_documents(app, user_ids, item_ids=None):
+    app.extensions['search_index'].mark_changed('item', item_ids)
+
+
+@users_changed.connect
+def refresh_user_documents(app, user_ids):
+    # Users are only added without ids
+    app.extensions['search_index'].mark_changed('user', user_ids or None)
@@ -0,0 +1,83 @@
+from functools import wraps
+import hashlib
+from flask import current_app, make_response, request, session
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from signals import items_changed, users_changed
+
+# One counter per table, bumped after every commit that changes it
+table_version = db.Table(
+    'table_version',
+    db.Column('name', db.String(50), primary_key=True),
+    db.Column('version', db.Integer, nullable=False, default=0),
+)
+
+
+# Bump the named counters on the primary, creating rows the first time a table changes
+def bump_versions(*names):
+    with db.engine.begin() as connection:
+        for name in names:
+            result = connection.execute(update(table_version)
+                                        .where(table_version.c.name == name)
+                                        .values(version=table_version.c.version + 1))
+            if result.rowcount:
+                continue
+            try:
+                with connection.begin_nested():
+                    connection.execute(table_version.insert().values(name=name, version=1))
+            except IntegrityError:
+                # Another worker created it first
+                connection.execute(update(table_version)
+                                   .where(table_version.c.name == name)
+                                   .values(version=table_version.c.version + 1))
+
+
+# {name: version} for the named tables; tables that never changed read as 0
+def read_versions(*names):
+    rows = db.session.execute(select(table_version.c.name, table_version.c.version)
+                              .where(table_version.c.name.in_(names)))
+    versions = dict.fromkeys(names, 0)
+    versions.update(rows.all())
+    return versions
+
+
+@items_changed.connect
+def bump_item_version(app, user_ids, item_ids=None):
+    with app.app_context():
+        bump_versions('item')
+
+
+@users_changed.connect
+def bump_user_version(app, user_ids):
+    with app.app_context():
+        bump_versions('user')
+
+
+def versions_etag(names):
+    versions = read_versions(*names)
+    key = [request.full_path, session.get('id'), session.get('role')]
+    key += [f'{name}={versions[name]}' for name in names]
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+# GET views whose output depends only on `names` tables and the session identity.
+# The counters are read before the view runs, so a change that lands mid-render
+# gets a newer ETag on the next request; a matching If-None-Match skips the view
+# entirely. Pages with pending flashes always render and are not cached.
+def versioned_view(*names):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+            etag = versions_etag(names)
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
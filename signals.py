@@ -0,0 +1,21 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent with the app as sender after a commit that changed items.
+# user_ids: owners whose item list changed (previous and new owners).
+# item_ids: the changed items, or None when unknown (bulk inserts).
+items_changed = _signals.signal('items-changed')
+
+
+def send_items_changed(app, user_ids=(), item_ids=None):
+    user_ids = {int(user_id) for user_id in user_ids if user_id not in (None, '')}
+    items_changed.send(app, user_ids=user_ids, item_ids=item_ids)
+
+# Sent with the app as sender after a commit that added, changed or deleted users.
+users_changed = _signals.signal('users-changed')
+
+
+def send_users_changed(app, user_ids=()):
+    user_ids = {int(user_id) for user_id in user_ids if user_id not in (None, '')}
+    users_changed.send(app, user_ids=user_ids)
@@ -1,6 +1,14 @@
 from datetime import datetime, timedelta
+from contextlib import contextmanager
+import io
+import json
 import logging
+import os
+import shutil
+import tempfile
 import unittest
+import sqlalchemy
+from sqlalchemy import event
 from app import create_app, db
 from models.users import User
 from models.items import Item
@@ -13,15 +21,15 @@ class AuthTestCase(unittest.TestCase):
         self.app_context = self.app.app_context()
         self.app_context.push()
 
+        # Create all tables (create_app no longer touches the schema)
+        db.create_all()
+
         # Check if user already exists
         existing_user = User.query.filter_by(phone_no='1234567890').first()
         if existing_user:
             db.session.delete(existing_user)
             db.session.commit()
 
-        # Create all tables
-        db.create_all()
-
         # Configure a separate logger for the tests
         self.test_log_file = 'test_log.log'
         self.logger = logging.getLogger('test_logger')
@@ -75,6 +83,139 @@ class AuthTestCase(unittest.TestCase):
             handler.close()
             self.logger.removeHandler(handler)
 
+    @contextmanager
+    def count_queries(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    def assert_uses_index(self, query):
+        # ORM queries or plain select() statements
+        statement = getattr(query, 'statement', query).compile(db.engine, compile_kwargs={'literal_binds': True})
+        with db.engine.connect() as connection:
+            if db.engine.dialect.name == 'sqlite':
+                plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}')]
+                # Subquery headers are not steps; rowid lookups are primary key searches
+                steps = [step for step in plan if not step.endswith(('SUBQUERY 1', 'SUBQUERY 2'))]
+                self.assertTrue(steps and all('INDEX' in step or 'PRIMARY KEY (rowid' in step for step in steps), plan)
+            else:
+                plan = connection.exec_driver_sql(f'EXPLAIN {statement}').mappings().all()
+                for step in plan:
+                    self.assertIsNotNone(step['key'], step)
+                    self.assertNotEqual(step['type'], 'ALL', step)
+
+    def test_create_app_makes_no_database_round_trip(self):
+        app = create_app('testing')
+        with app.app_context():
+            pool = db.engine.pool
+            self.assertEqual(pool.checkedin() + pool.checkedout(), 0)
+        self.assertGreater(app.extensions['startup_seconds'], 0)
+
+    def test_logging_is_queued_sampled_and_json(self):
+        from utils.logs import stop_listener
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        app = create_app('testing', {'LOG_DIR': log_dir, 'LOG_JSON': True, 'LOG_SAMPLE_RATES': {'Listed %s': 0.5}})
+        for i in range(4):
+            app.logger.info('Listed %s', i)
+        app.logger.error('Broken %s', 'thing')
+        stop_listener(app.extensions['log_listener'])
+
+        with open(os.path.join(log_dir, 'general.log')) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual([entry['message'] for entry in entries[1:]], ['Listed 0', 'Listed 2', 'Broken thing'])
+        self.assertEqual(entries[1]['sample_rate'], 0.5)
+        with open(os.path.join(log_dir, 'error.log')) as f:
+            self.assertEqual([json.loads(line)['level'] for line in f], ['ERROR'])
+
+    def test_pool_stats_reports_checkouts(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        self.client.get('/admin_dashboard/all_users')
+        response = self.client.get('/admin_dashboard/pool_stats')
+        self.assertEqual(response.status_code, 200)
+        stats = response.get_json()
+        self.assertEqual(stats['class'], 'InstrumentedQueuePool')
+        self.assertEqual(stats['size'], self.app.config['DB_POOL_SIZE'])
+        self.assertGreater(stats['checkouts'], 0)
+
+    def make_replica(self, email='replica@nucleusteq.com'):
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        uri = f'sqlite:///{path}'
+        engine = sqlalchemy.create_engine(uri)
+        db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(User.__table__.insert().values(
+                first_name='Replica', last_name='Only', phone_no='5555555555',
+                email=email, password_hash='x', role='user'))
+        engine.dispose()
+        return uri
+
+    def test_read_only_views_use_replicas(self):
+        app = create_app('testing', {'SQLALCHEMY_REPLICA_URIS': [self.make_replica()]})
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = 'admin@nucleusteq.com'
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+
+        response = client.get('/admin_dashboard/all_users')
+        self.assertIn(b'replica@nucleusteq.com', response.data)
+        self.assertNotIn(b'test@nucleusteq.com', response.data)
+
+        # Writes go to the primary, and the writer reads from the primary right after
+        client.post('/admin_dashboard/add_item', data={
+            'name': 'Router', 'serial_number': 'SN-R-1', 'bill_number': 'BN-R-1',
+            'date_of_purchase': '2023-01-01', 'warranty': '1 year'})
+        self.assertEqual(Item.query.filter_by(serial_number='SN-R-1').count(), 1)
+        response = client.get('/admin_dashboard/all_items')
+        self.assertIn(b'SN-R-1', response.data)
+
+    def test_read_only_view_reads_one_replica(self):
+        app = create_app('testing', {'SQLALCHEMY_REPLICA_URIS': [
+            self.make_replica('first@nucleusteq.com'), self.make_replica('second@nucleusteq.com')]})
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = 'admin@nucleusteq.com'
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        used = []
+        for number, replica in enumerate(app.extensions['replica_router'].replicas):
+            sqlalchemy.event.listen(replica.engine, 'before_cursor_execute',
+                                    lambda *args, number=number: used.append(number))
+
+        for _ in range(2):
+            del used[:]
+            client.get('/admin_dashboard/all_items')
+            # change counters and rows come from the same replica
+            self.assertGreater(len(used), 1)
+            self.assertEqual(len(set(used)), 1)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        app = create_app('testing', {'SQLALCHEMY_REPLICA_URIS': ['sqlite:////nonexistent/dir/replica.db']})
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = 'admin@nucleusteq.com'
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        response = client.get('/admin_dashboard/all_users')
+        self.assertIn(b'test@nucleusteq.com', response.data)
+
     def test_home_page(self):
         response = self.client.get('/')
         self.assertEqual(response.status_code, 200)
@@ -191,7 +332,90 @@ class AuthTestCase(unittest.TestCase):
         })
         self.assertEqual(response.status_code, 302)  # Redirect to employee dashboard
         self.assertEqual(response.location,'/employee_dashboard?user_id=1')
-        # self.assertEqual("Admin logged in successfully",response.data)    
+        # self.assertEqual("Admin logged in successfully",response.data)
+
+    def test_login_rehashes_outdated_password_hash(self):
+        from models.users import hash_password
+        self.user.password_hash = hash_password('password', 500)
+        db.session.commit()
+        response = self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 302)
+        db.session.refresh(self.user)
+        self.assertTrue(self.user.password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(self.user.verify_password('password'))
+
+    def test_login_reads_the_user_once(self):
+        with self.count_queries() as statements:
+            response = self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        self.assertEqual(response.location, '/employee_dashboard?user_id=1')
+        self.assertEqual(len([sql for sql in statements if 'FROM user' in sql]), 1)
+
+    def test_login_survives_user_deleted_during_verify(self):
+        passwords = self.app.extensions['password_hashing']
+        verify = passwords.verify
+        user_id = self.user.id
+
+        def verify_then_delete(password_hash, password):
+            with db.engine.begin() as connection:
+                connection.execute(sqlalchemy.delete(User).where(User.id == user_id))
+            return verify(password_hash, password)
+
+        passwords.verify = verify_then_delete
+        self.addCleanup(delattr, passwords, 'verify')
+        response = self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_login_rate_limited_per_email_before_lookup(self):
+        bad = {'email': 'test@nucleusteq.com', 'password': 'wrong'}
+        for _ in range(self.app.config['LOGIN_EMAIL_LIMIT']):
+            self.assertEqual(self.client.post('/login', data=bad).status_code, 200)
+        with self.count_queries() as statements:
+            response = self.client.post('/login', data=bad)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(b'Too many login attempts', response.data)
+        self.assertEqual(statements, [])
+
+        # Other accounts from the same client are still allowed
+        response = self.client.post('/login', data={'email': 'admin@nucleusteq.com', 'password': 'adminpassword'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_login_rate_limited_per_ip(self):
+        app = create_app('testing', {'LOGIN_IP_LIMIT': 2})
+        client = app.test_client()
+        for i in range(2):
+            client.post('/login', data={'email': f'nobody{i}@nucleusteq.com', 'password': 'wrong'})
+        response = client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], str(app.config['LOGIN_RATE_WINDOW']))
+
+    def test_login_rejected_when_hashing_pool_saturated(self):
+        app = create_app('testing', {'PASSWORD_HASH_MAX_PENDING': 0})
+        response = app.test_client().post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(app.extensions['password_hashing'].rejected, 1)
+
+    def test_hashing_pool_runs_in_worker_processes(self):
+        from services.passwords import HashingPool, needs_rehash
+        pool = HashingPool(workers=1, max_pending=2, iterations=1000)
+        self.addCleanup(pool.shutdown)
+        password_hash = pool.hash('secret')
+        self.assertTrue(pool.verify(password_hash, 'secret'))
+        self.assertFalse(pool.verify(password_hash, 'wrong'))
+        self.assertFalse(needs_rehash(password_hash, 1000))
+        self.assertTrue(needs_rehash(password_hash, 2000))
+
+    def test_hashing_pool_hash_many_waits_for_a_slot(self):
+        from services.passwords import HashingPool, HashingPoolSaturated
+        pool = HashingPool(workers=0, max_pending=1, iterations=1000)
+        hashes = pool.hash_many(['first1', 'second2', 'third3'])
+        self.assertEqual(len(hashes), 3)
+        self.assertTrue(pool.verify(hashes[2], 'third3'))
+
+        pool.slots.acquire()
+        with self.assertRaises(HashingPoolSaturated):
+            pool.hash_many(['first1'], timeout=0)
+        self.assertEqual(pool.rejected, 1)
 
 
     def test_employee_dashboard(self):
@@ -200,6 +424,7 @@ class AuthTestCase(unittest.TestCase):
             sess['first_name'] = self.user.first_name 
             sess['id'] = self.user.id
             sess['email'] = self.user.email
+            sess['role'] = 'user'
         response = self.client.get('/employee_dashboard')
         self.assertEqual(response.status_code, 200)
 
@@ -216,6 +441,7 @@ class AuthTestCase(unittest.TestCase):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['id'] = self.user.id
+            sess['role'] = 'user'
 
         response = self.client.get('/profile')
         self.assertEqual(response.status_code, 200)
@@ -226,14 +452,53 @@ class AuthTestCase(unittest.TestCase):
         self.assertIn(b'test@nucleusteq.com', response.data)
         self.assertIn(b'1234567890', response.data)   
 
+    def test_profile_served_from_session_identity(self):
+        self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        with self.count_queries() as statements:
+            response = self.client.get('/profile')
+        self.assertIn(b'test@nucleusteq.com', response.data)
+        self.assertIn(b'1990-01-01', response.data)
+        self.assertEqual(statements, [])
+
+        # A change to the user invalidates snapshots taken before it
+        from signals import send_users_changed
+        send_users_changed(self.app, user_ids=[self.user.id])
+        db.session.expire_all()
+        with self.count_queries() as statements:
+            response = self.client.get('/profile')
+        self.assertIn(b'test@nucleusteq.com', response.data)
+        self.assertEqual(len(statements), 1)
+
+        with self.count_queries() as statements:
+            self.client.get('/profile')
+        self.assertEqual(statements, [])
+
+    def test_identity_snapshot_is_stable_across_workers(self):
+        self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        cookie = self.client.get_cookie('session').value
+        # A second worker: same database, its own engine and in-memory caches
+        other = create_app('testing', {'METRICS_SERVER_TIMING': True}).test_client()
+        other.set_cookie('session', cookie)
+        response = other.get('/profile')
+        self.assertIn(b'test@nucleusteq.com', response.data)
+        self.assertIn('desc="1 queries"', response.headers['Server-Timing'])
+        self.assertNotIn('Set-Cookie', response.headers)
+
+        self.assertIn('desc="0 queries"', other.get('/profile').headers['Server-Timing'])
+        with self.count_queries() as statements:
+            self.client.get('/profile')
+        self.assertEqual(statements, [])
+
     def test_profile_user_not_found(self):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['id'] = 999  # User ID not in database
+            sess['role'] = 'user'
 
+        # A session for a user that no longer exists grants nothing
         response = self.client.get('/profile', follow_redirects=True)
         self.assertEqual(response.status_code, 200)
-        self.assertIn(b'User not found', response.data)
+        self.assertIn(b'You are not logged in', response.data)
 
     def test_profile_not_logged_in(self):
         response = self.client.get('/profile', follow_redirects=True)
@@ -247,6 +512,7 @@ class AuthTestCase(unittest.TestCase):
             sess['loggedin'] = True
             sess['id'] = self.admin.id
             sess['email'] = self.admin.email
+            sess['role'] = 'admin'
         response = self.client.get('/admin_dashboard')
         self.assertEqual(response.status_code, 200)
 
@@ -256,6 +522,8 @@ class AuthTestCase(unittest.TestCase):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = 'john@nucleusteq.com'  # Non-admin user
+            sess['id'] = self.user.id
+            sess['role'] = 'user'
             sess['first_name'] = 'John'
         response = self.client.get('/admin_dashboard', follow_redirects=True)
         self.assertEqual(response.status_code, 200)
@@ -267,7 +535,85 @@ class AuthTestCase(unittest.TestCase):
         response = self.client.get('/admin_dashboard', follow_redirects=True)
         self.assertEqual(response.status_code, 200)
         # self.assertIn(b'You are not logged in', response.data)
-        self.assertNotIn(b'Admin Dashboard', response.data) 
+        self.assertNotIn(b'Admin Dashboard', response.data)
+
+# role-based permissions
+    def test_login_stores_role_in_session(self):
+        self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        with self.client.session_transaction() as sess:
+            self.assertEqual(sess['role'], 'user')
+        response = self.client.get('/admin_dashboard/all_items', follow_redirects=True)
+        self.assertIn(b'You are not logged in', response.data)
+        self.assertEqual(self.client.get('/assigned_item').status_code, 200)
+
+    def test_admin_role_grants_access_regardless_of_email(self):
+        self.user.role = 'admin'
+        db.session.commit()
+        response = self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        self.assertIn('/admin_dashboard', response.location)
+        self.assertEqual(self.client.get('/admin_dashboard/all_items').status_code, 200)
+        self.assertEqual(self.client.get('/admin_dashboard/all_items.json').status_code, 200)
+
+    def test_json_views_deny_missing_permission(self):
+        self.assertEqual(self.client.get('/admin_dashboard/all_items.json').status_code, 401)
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['id'] = self.user.id
+            sess['role'] = 'user'
+        self.assertEqual(self.client.get('/admin_dashboard/all_items.json').status_code, 403)
+        self.assertEqual(self.client.post('/admin_dashboard/assign_items', json=[]).status_code, 403)
+
+    def test_compile_permissions_expands_inherited_roles(self):
+        from auth.permissions import compile_permissions
+        compiled = compile_permissions({'user': {'profile:view'}, 'admin': {'role:user', 'items:manage'}})
+        self.assertEqual(compiled['admin'], frozenset({'role:user', 'profile:view', 'items:manage'}))
+        self.assertIsInstance(compiled['user'], frozenset)
+
+        # Inheritance is transitive whatever order the roles are listed in
+        compiled = compile_permissions({'owner': {'role:admin'}, 'admin': {'role:user', 'items:manage'},
+                                        'user': {'profile:view'}})
+        self.assertLessEqual({'profile:view', 'items:manage'}, compiled['owner'])
+        with self.assertRaisesRegex(ValueError, 'cyclic'):
+            compile_permissions({'a': {'role:b'}, 'b': {'role:c'}, 'c': {'role:a'}})
+        with self.assertRaisesRegex(ValueError, 'unknown role'):
+            compile_permissions({'a': {'role:missing'}})
+
+    def test_role_change_applies_without_new_login(self):
+        self.user.role = 'admin'
+        db.session.commit()
+        self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        self.assertEqual(self.client.get('/admin_dashboard/all_items.json').status_code, 200)
+
+        self.user.role = 'user'
+        db.session.commit()
+        from signals import send_users_changed
+        send_users_changed(self.app, user_ids=[self.user.id])
+        self.assertEqual(self.client.get('/admin_dashboard/all_items.json').status_code, 403)
+
+        # A deleted user keeps no permissions either
+        self.assertEqual(self.client.get('/assigned_item').status_code, 200)
+        db.session.delete(self.user)
+        db.session.commit()
+        send_users_changed(self.app, user_ids=[self.user.id])
+        self.assertEqual(self.client.get('/assigned_item').status_code, 302)
+
+    def test_role_change_from_another_worker_applies_after_recheck(self):
+        from auth.identity import version_key
+        self.user.role = 'admin'
+        db.session.commit()
+        self.client.post('/login', data={'email': 'test@nucleusteq.com', 'password': 'password'})
+        self.assertEqual(self.client.get('/admin_dashboard/all_items.json').status_code, 200)
+
+        # Another worker demotes the user: only the shared version is dropped here
+        self.user.role = 'user'
+        db.session.commit()
+        self.app.extensions['identity_versions'].delete(version_key(self.user.id))
+        self.assertEqual(self.client.get('/admin_dashboard/all_items.json').status_code, 200)
+
+        confirmed = self.app.extensions['confirmed_identities']
+        version, expires, role, permissions = confirmed[self.user.id]
+        confirmed[self.user.id] = (version, 0, role, permissions)
+        self.assertEqual(self.client.get('/admin_dashboard/all_items.json').status_code, 403)
 
 # admin profile test
     def test_admin_profile_logged_in(self):
@@ -275,6 +621,7 @@ class AuthTestCase(unittest.TestCase):
             sess['loggedin'] = True
             sess['id'] = self.admin.id
             sess['email'] = self.admin.email
+            sess['role'] = 'admin'
 
         response = self.client.get('/admin_dashboard/admin_profile')
         self.assertEqual(response.status_code, 200)
@@ -291,6 +638,7 @@ class AuthTestCase(unittest.TestCase):
             sess['loggedin'] = True
             sess['id'] = 999  # Admin ID not in database
             sess['email'] = 'admin@nucleusteq.com'
+            sess['role'] = 'admin'
 
         response = self.client.get('/admin_dashboard/admin_profile', follow_redirects=True)
         self.assertEqual(response.status_code, 200)
@@ -307,6 +655,7 @@ class AuthTestCase(unittest.TestCase):
             sess['loggedin'] = True
             sess['id'] = self.admin.id
             sess['email'] = self.admin.email
+            sess['role'] = 'admin'
 
         response = self.client.get('/admin_dashboard/all_users')
         self.assertEqual(response.status_code, 200)
@@ -315,6 +664,94 @@ class AuthTestCase(unittest.TestCase):
         self.assertIn(b'User', response.data)
    
 
+    def test_all_users_query_count_is_constant(self):
+        for i in range(20):
+            user = User(first_name=f'Bulk{i}', last_name='User', phone_no=f'70000000{i:02d}',
+                        email=f'bulk{i}@nucleusteq.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Item(name='Mouse', serial_number=f'SN-M-{i}', bill_number=f'BN-M-{i}',
+                                date_of_purchase=datetime(2023, 1, 1), assigned_to_id=user.id))
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['id'] = self.admin.id
+            sess['email'] = self.admin.email
+            sess['role'] = 'admin'
+        db.session.commit()
+        # Takes the identity snapshot a real login would have stored
+        self.client.get('/admin_dashboard/admin_profile')
+
+        with self.count_queries() as statements:
+            response = self.client.get('/admin_dashboard/all_users')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Mouse', response.data)
+        # change counters, users and one batched item load, independent of the number of users
+        self.assertLessEqual(len(statements), 3)
+
+    def test_list_views_revalidate_against_change_counters(self):
+        self.login_as_admin()
+        for url in ('/admin_dashboard/all_items', '/admin_dashboard/all_users'):
+            response = self.client.get(url)
+            etag = response.headers['ETag']
+            with self.count_queries() as statements:
+                response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+            # only the change counters are read
+            self.assertEqual(len(statements), 1)
+            self.assertNotEqual(self.client.get(url + '?limit=1').headers['ETag'], etag)
+
+        etag = self.client.get('/admin_dashboard/all_items').headers['ETag']
+        self.client.post('/edit_item', data={'item_id': self.item.id, 'name': 'Renamed', 'serial_number': 'SN12345679',
+                                                  'bill_number': 'BN12345679', 'date_of_purchase': '2023-01-01',
+                                                  'warranty': '2 years'})
+        # The redirect target carries a flash, so it renders and sets no ETag
+        response = self.client.get('/admin_dashboard/all_items', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response.headers)
+        response = self.client.get('/admin_dashboard/all_items', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Renamed', response.data)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+        etag = self.client.get('/admin_dashboard/all_users').headers['ETag']
+        from signals import send_users_changed
+        send_users_changed(self.app, user_ids=[self.user.id])
+        response = self.client.get('/admin_dashboard/all_users', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_views_rerender_only_changed_rows(self):
+        desks = self.add_items(3, assigned_to_id=self.user.id)
+        self.login_as_admin()
+        fragments = self.app.extensions['row_fragments']
+
+        def cached(kind, row_id):
+            return fragments.get((kind, row_id))[1]
+
+        self.client.get('/admin_dashboard/all_items')
+        self.client.get('/admin_dashboard/all_users')
+        before = {desk.id: cached('item', desk.id) for desk in desks}
+        admin_card = cached('user', self.admin.id)
+
+        self.client.post('/edit_item', data={'item_id': desks[1].id, 'name': 'Standing desk',
+                                             'serial_number': desks[1].serial_number,
+                                             'bill_number': desks[1].bill_number,
+                                             'date_of_purchase': '2023-01-01', 'warranty': '1 year'})
+        response = self.client.get('/admin_dashboard/all_items')
+        self.assertIn(b'Standing desk', response.data)
+        self.assertIs(cached('item', desks[0].id), before[desks[0].id])
+        self.assertIs(cached('item', desks[2].id), before[desks[2].id])
+        self.assertIsNot(cached('item', desks[1].id), before[desks[1].id])
+
+        response = self.client.get('/admin_dashboard/all_users')
+        self.assertIn(b'Standing desk', response.data)
+        self.assertIs(cached('user', self.admin.id), admin_card)
+
+        # A change made without a signal here (another worker) is caught by the row version
+        User.query.filter_by(id=self.user.id).update({'first_name': 'Renamed'})
+        db.session.commit()
+        self.assertIn(b'Renamed User', self.client.get('/admin_dashboard/all_items').data)
+
     def test_all_users_not_logged_in(self):
         response = self.client.get('/admin_dashboard/all_users', follow_redirects=True)
         self.assertEqual(response.status_code, 200)
@@ -327,6 +764,8 @@ class AuthTestCase(unittest.TestCase):
         with self.client.session_transaction() as session:
             session['loggedin'] = True
             session['email'] = 'admin@nucleusteq.com'
+            session['id'] = self.admin.id
+            session['role'] = 'admin'
 
         # Provide valid user data
         user_data = {
@@ -346,6 +785,25 @@ class AuthTestCase(unittest.TestCase):
         self.assertIn(b'Employee added successfully', response.data)
  
 
+    def test_add_user_rejects_unknown_role(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+
+        response = self.client.post('/add_user', data={
+            'first_name': 'Test',
+            'last_name': 'User',
+            'dob': '1990-01-01',
+            'phone_no': '9876543210',
+            'email': 'superuser@nucleusteq.com',
+            'password': 'test_password',
+            'role': 'superuser',
+        }, follow_redirects=True)
+        self.assertIn(b'Unknown role', response.data)
+        self.assertIsNone(User.query.filter_by(email='superuser@nucleusteq.com').first())
+
     def test_add_user_not_logged_in(self):
         response = self.client.post('/add_user', follow_redirects=True)
         self.assertEqual(response.status_code, 200)
@@ -355,6 +813,8 @@ class AuthTestCase(unittest.TestCase):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
 
         data = {
             'first_name': 'Test',
@@ -367,11 +827,73 @@ class AuthTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         
 
+# bulk user import
+    def test_import_users_validates_and_batches_uniqueness(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        csv_data = (
+            'first_name,last_name,dob,phone_no,email,password\n'
+            'Asha,Rao,1991-05-01,9000000001,asha@nucleusteq.com,secret123\n'
+            'Dup,Email,,9000000002,test@nucleusteq.com,secret123\n'
+            'Dup,Phone,,1234567890,dupphone@nucleusteq.com,secret123\n'
+            'Bad,Email,,9000000004,bad@example.com,secret123\n'
+            'Bad,Phone,,12345,badphone@nucleusteq.com,secret123\n'
+            'Bad,Dob,31-12-1990,9000000006,baddob@nucleusteq.com,secret123\n'
+            'Short,Pass,,9000000007,short@nucleusteq.com,abc\n'
+            'Ravi,Kumar,,9000000008,ravi@nucleusteq.com,secret123\n'
+        )
+        csv_data = csv_data.replace('first_name,last_name,dob,phone_no,email,password\n',
+                                    'first_name,last_name,dob,phone_no,email,password,role\n')
+        csv_data += 'Bad,Role,,9000000009,badrole@nucleusteq.com,secret123,superuser\n'
+        response = self.client.post('/import_users', data={
+            'file': (io.BytesIO(csv_data.encode()), 'users.csv'),
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertEqual(report['inserted'], 2)
+        self.assertEqual([(error['row'], error['error']) for error in report['errors']], [
+            (3, 'Email already exists'),
+            (4, 'Phone number already exists'),
+            (5, 'Invalid email address'),
+            (6, 'Phone number must be a 10-digit number'),
+            (7, 'Invalid date format for Date of Birth'),
+            (8, 'Password must be at least 6 characters long'),
+            (10, 'Unknown role'),
+        ])
+        self.assertIn('rows_per_second', report)
+        self.assertTrue(User.query.filter_by(email='asha@nucleusteq.com').one().verify_password('secret123'))
+
+    def test_import_users_cli_hashes_in_worker_pool(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            for i in range(4):
+                handle.write(f'{{"first_name": "Pool{i}", "last_name": "User", "phone_no": "800000000{i}", '
+                             f'"email": "pool{i}@nucleusteq.com", "password": "secret{i}{i}{i}"}}\n')
+        self.addCleanup(os.remove, handle.name)
+
+        result = self.app.test_cli_runner().invoke(args=['import-users', handle.name, '--workers', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Inserted 4 users, 0 errors', result.output)
+        self.assertTrue(User.query.filter_by(email='pool3@nucleusteq.com').one().verify_password('secret333'))
+
+    def test_import_users_requires_admin(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.user.email
+            sess['id'] = self.user.id
+            sess['role'] = 'user'
+        response = self.client.post('/import_users')
+        self.assertEqual(response.status_code, 403)
+
 #delete user
     def test_successful_user_deletion(self):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
 
         # Create a user to delete
         user = User(first_name='test3', last_name='user',phone_no = "9981365266", email='test3@nucleusteq.com', password='password123')
@@ -392,11 +914,55 @@ class AuthTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)  # Redirect to login
         self.assertIn(b'You are not logged in', response.data)
 
+# employee typeahead
+    def test_search_employees_by_prefix(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+
+        response = self.client.get('/admin_dashboard/employees/search?q=adm')
+        self.assertEqual(response.status_code, 200)
+        emails = [employee['email'] for employee in response.get_json()['employees']]
+        self.assertEqual(emails, ['admin@nucleusteq.com'])
+
+        response = self.client.get('/admin_dashboard/employees/search?q=user&limit=1')
+        self.assertEqual(len(response.get_json()['employees']), 1)
+
+    def test_search_employees_cache_invalidated_on_add_user(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+
+        response = self.client.get('/admin_dashboard/employees/search?q=zed')
+        self.assertEqual(response.get_json()['employees'], [])
+
+        self.client.post('/add_user', data={
+            'first_name': 'Zed',
+            'last_name': 'User',
+            'dob': '1990-01-01',
+            'phone_no': '9981474700',
+            'email': 'zed@nucleusteq.com',
+            'password': 'password123'
+        })
+        response = self.client.get('/admin_dashboard/employees/search?q=zed')
+        emails = [employee['email'] for employee in response.get_json()['employees']]
+        self.assertEqual(emails, ['zed@nucleusteq.com'])
+
+    def test_search_employees_not_logged_in(self):
+        response = self.client.get('/admin_dashboard/employees/search?q=a')
+        self.assertEqual(response.status_code, 401)
+
 #add item
     def test_successful_item_addition(self):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
         response = self.client.post('/admin_dashboard/add_item', data={
             'name': 'Laptop',
             'serial_number': 'SN12345678',
@@ -424,6 +990,8 @@ class AuthTestCase(unittest.TestCase):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
         response = self.client.post('/admin_dashboard/add_item', data={
             'name': 'Laptop',
             'serial_number': 'SN12345678',
@@ -439,6 +1007,8 @@ class AuthTestCase(unittest.TestCase):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
         response = self.client.post('/admin_dashboard/add_item', data={
             'name': 'Laptop',
             'serial_number': 'SN12345678',
@@ -454,6 +1024,8 @@ class AuthTestCase(unittest.TestCase):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
         item = Item(name='Laptop', serial_number='SN12345678', bill_number='BN12345678', date_of_purchase=(datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'), warranty='2 years', assigned_to_id=self.admin.id)
         db.session.add(item)
         db.session.commit()
@@ -473,6 +1045,8 @@ class AuthTestCase(unittest.TestCase):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
         item = Item(name='Laptop', serial_number='SN12345678', bill_number='BN12345678', date_of_purchase=(datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'), warranty='2 years', assigned_to_id=self.admin.id)
         db.session.add(item)
         db.session.commit()
@@ -488,17 +1062,241 @@ class AuthTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Bill number already exists', response.data)
 
-    
+
+# bulk item import
+    def test_import_items_csv_reports_row_errors(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        csv_data = (
+            'name,serial_number,bill_number,date_of_purchase,warranty,assigned_to_id\n'
+            f'Laptop,SN-B-1,BN-B-1,2023-02-01,1 year,{self.user.id}\n'
+            'Laptop,SN12345679,BN-B-2,2023-02-01,,\n'  # serial already in the table
+            'Laptop,SN-B-1,BN-B-3,2023-02-01,,\n'      # serial repeated in the file
+            'Laptop,SN-B-4,BN-B-4,not-a-date,,\n'
+            'Laptop,SN-B-5,BN-B-5,2023-02-01,,999\n'
+            'Monitor,SN-B-6,BN-B-6,2023-02-01,,\n'
+        )
+        response = self.client.post('/admin_dashboard/import_items', data={
+            'file': (io.BytesIO(csv_data.encode()), 'items.csv'),
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertEqual(report['inserted'], 2)
+        self.assertEqual([(error['row'], error['error']) for error in report['errors']], [
+            (3, 'Serial number already exists'),
+            (4, 'Serial number already exists'),
+            (5, 'Invalid date format'),
+            (6, 'Assigned user not found'),
+        ])
+        self.assertEqual(Item.query.filter_by(serial_number='SN-B-1').one().assigned_to_id, self.user.id)
+
+    def test_import_items_cli_jsonl_in_chunks(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            for i in range(5):
+                handle.write(f'{{"name": "Dock", "serial_number": "SN-D-{i}", "bill_number": "BN-D-{i}", "date_of_purchase": "2023-03-01"}}\n')
+            handle.write('not json\n')
+        self.addCleanup(os.remove, handle.name)
+
+        result = self.app.test_cli_runner().invoke(args=['import-items', handle.name, '--chunk-size', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Inserted 5 items, 1 errors', result.output)
+        self.assertEqual(Item.query.filter_by(name='Dock').count(), 5)
+
+    def test_import_cli_invalidates_cached_views(self):
+        self.login_as_admin()
+        items_etag = self.client.get('/admin_dashboard/all_items').headers['ETag']
+        users_etag = self.client.get('/admin_dashboard/all_users').headers['ETag']
+        runner = self.app.test_cli_runner()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write('{"name": "Hub", "serial_number": "SN-H-1", "bill_number": "BN-H-1", "date_of_purchase": "2023-03-01"}\n')
+        self.addCleanup(os.remove, handle.name)
+        self.assertEqual(runner.invoke(args=['import-items', handle.name]).exit_code, 0)
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write('{"first_name": "Cli", "last_name": "User", "phone_no": "8100000000", '
+                         '"email": "cli@nucleusteq.com", "password": "secret1"}\n')
+        self.addCleanup(os.remove, handle.name)
+        self.assertEqual(runner.invoke(args=['import-users', handle.name]).exit_code, 0)
+
+        response = self.client.get('/admin_dashboard/all_items', headers={'If-None-Match': items_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Hub', response.data)
+        response = self.client.get('/admin_dashboard/all_users', headers={'If-None-Match': users_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'cli@nucleusteq.com', response.data)
+
+# inventory export
+    def test_export_items_csv_streams_with_owner(self):
+        self.add_items(2, assigned_to_id=self.user.id)
+        self.login_as_admin()
+        response = self.client.get('/admin_dashboard/export_items?format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertIn('attachment; filename=items.csv', response.headers['Content-Disposition'])
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], 'id,name,serial_number,bill_number,date_of_purchase,warranty,'
+                                   'assigned_to_id,owner_first_name,owner_last_name,owner_email')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].endswith(',,,,'))  # the seeded laptop has no owner
+        self.assertTrue(lines[2].endswith('Test,User,test@nucleusteq.com'))
+
+    def test_export_items_jsonl_gzip(self):
+        import gzip
+        import json
+        self.add_items(3)
+        self.login_as_admin()
+        response = self.client.get('/admin_dashboard/export_items?format=jsonl&gzip=1')
+        self.assertEqual(response.mimetype, 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(response.data).splitlines()]
+        self.assertEqual([row['serial_number'] for row in rows], ['SN12345679', 'SN-Desk-0', 'SN-Desk-1', 'SN-Desk-2'])
+        self.assertEqual(rows[1]['date_of_purchase'], '2023-01-01')
+        self.assertIsNone(rows[1]['owner_email'])
+
+    def test_export_items_cli_reads_in_chunks(self):
+        import gzip
+        from services.exporter import export_rows
+        self.add_items(4)
+        self.assertEqual([len(rows) for rows in export_rows(chunk_size=2)], [2, 2, 1])
+
+        handle, path = tempfile.mkstemp(suffix='.csv.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        result = self.app.test_cli_runner().invoke(args=['export-items', path, '--chunk-size', '2'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with gzip.open(path, 'rt') as export:
+            self.assertEqual(len(export.read().splitlines()), 6)
+
+    def test_export_items_requires_permission(self):
+        response = self.client.get('/admin_dashboard/export_items', follow_redirects=True)
+        self.assertIn(b'You are not logged in', response.data)
+
+    def test_import_items_not_logged_in(self):
+        response = self.client.post('/admin_dashboard/import_items')
+        self.assertEqual(response.status_code, 401)
+
 # all item route
     def test_successful_access_all_items(self):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
         response = self.client.get('/admin_dashboard/all_items')
         self.assertEqual(response.status_code, 200)
 
         
 
+    def add_items(self, count, assigned_to_id=None, prefix='Desk'):
+        items = [Item(name=f'{prefix} {i}', serial_number=f'SN-{prefix}-{i}', bill_number=f'BN-{prefix}-{i}',
+                      date_of_purchase=datetime(2023, 1, 1), assigned_to_id=assigned_to_id)
+                 for i in range(count)]
+        db.session.add_all(items)
+        db.session.commit()
+        return items
+
+    def test_all_items_filters_on_server(self):
+        self.add_items(3, prefix='Chair')
+        self.add_items(2, assigned_to_id=self.user.id, prefix='Phone')
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+
+        response = self.client.get('/admin_dashboard/all_items?status=unassigned')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'SN-Chair-0', response.data)
+        self.assertNotIn(b'SN-Phone-0', response.data)
+
+        response = self.client.get(f'/admin_dashboard/all_items?owner={self.user.id}')
+        self.assertIn(b'SN-Phone-1', response.data)
+        self.assertNotIn(b'SN-Chair-0', response.data)
+
+        response = self.client.get('/admin_dashboard/all_items?q=Cha')
+        self.assertIn(b'SN-Chair-2', response.data)
+        self.assertNotIn(b'SN-Phone-0', response.data)
+
+    def test_all_items_json_keyset_pagination(self):
+        self.add_items(5)
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+
+        seen = []
+        url = '/admin_dashboard/all_items.json?q=Desk&limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.get_json()
+            self.assertLessEqual(len(data['items']), 2)
+            seen.extend(item['serial_number'] for item in data['items'])
+            cursor = data['next_cursor']
+            url = f'/admin_dashboard/all_items.json?q=Desk&limit=2&after={cursor}' if cursor else None
+        self.assertEqual(seen, [f'SN-Desk-{i}' for i in range(5)])
+
+    def test_all_items_json_not_logged_in(self):
+        response = self.client.get('/admin_dashboard/all_items.json')
+        self.assertEqual(response.status_code, 401)
+
+# versioned JSON API
+    def login_as_admin(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+
+    def test_api_items_sparse_fields_and_cursor(self):
+        self.add_items(3)
+        self.login_as_admin()
+        response = self.client.get('/api/v1/items?fields=serial_number,id&limit=2')
+        self.assertEqual(response.status_code, 200)
+        page = response.get_json()
+        self.assertEqual(page['items'], [{'serial_number': 'SN12345679', 'id': self.item.id},
+                                         {'serial_number': 'SN-Desk-0', 'id': page['items'][1]['id']}])
+        page = self.client.get(f"/api/v1/items?fields=name&after={page['next_cursor']}").get_json()
+        self.assertEqual(page, {'items': [{'name': 'Desk 1'}, {'name': 'Desk 2'}], 'next_cursor': None})
+
+        response = self.client.get(f'/api/v1/items/{self.item.id}')
+        self.assertEqual(response.get_json(), self.item.to_dict())
+        self.assertEqual(self.client.get('/api/v1/items?fields=password_hash').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/items/999').status_code, 404)
+
+    def test_api_users_never_expose_password_hash(self):
+        self.login_as_admin()
+        users = self.client.get('/api/v1/users').get_json()['users']
+        self.assertEqual([user['email'] for user in users], ['test@nucleusteq.com', 'admin@nucleusteq.com'])
+        self.assertNotIn('password_hash', users[0])
+        self.assertEqual(users[0]['dob'], '1990-01-01')
+        self.assertEqual(self.client.get('/api/v1/users?fields=password_hash').status_code, 400)
+        response = self.client.get(f'/api/v1/users/{self.user.id}?fields=first_name')
+        self.assertEqual(response.get_json(), {'first_name': 'Test'})
+
+    def test_api_etag_returns_not_modified(self):
+        self.login_as_admin()
+        response = self.client.get('/api/v1/items')
+        etag = response.headers['ETag']
+        response = self.client.get('/api/v1/items', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        self.add_items(1)
+        response = self.client.get('/api/v1/items', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_api_requires_permission(self):
+        self.assertEqual(self.client.get('/api/v1/items').status_code, 401)
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['id'] = self.user.id
+            sess['role'] = 'user'
+        self.assertEqual(self.client.get('/api/v1/users').status_code, 403)
+
     def test_unauthorized_access_all_items(self):
         response = self.client.get('/admin_dashboard/all_items', follow_redirects=True)
         self.assertEqual(response.status_code, 200)  # because of redirect
@@ -526,6 +1324,7 @@ class AuthTestCase(unittest.TestCase):
             sess['loggedin'] = True
             sess['id'] = self.admin.id
             sess['email'] = self.admin.email
+            sess['role'] = 'admin'
         
         response = self.client.post('/admin_dashboard/assign_item', data={
             'item_id': item.id,
@@ -534,12 +1333,314 @@ class AuthTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect to items
         self.assertEqual(Item.query.filter_by(assigned_to_id=self.user.id).count(), 1)
 
+    def test_assign_and_add_item_reject_bad_user_ids(self):
+        self.login_as_admin()
+        for assigned_to in ('abc', '999999'):
+            response = self.client.post('/admin_dashboard/assign_item', data={
+                'item_id': self.item.id, 'assigned_to': assigned_to}, follow_redirects=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'User not found', response.data)
+            response = self.client.post('/admin_dashboard/add_item', data={
+                'name': 'Dock', 'serial_number': f'SN-{assigned_to}', 'bill_number': f'BN-{assigned_to}',
+                'date_of_purchase': '2023-01-01', 'warranty': '1 year', 'assigned_to_id': assigned_to,
+            }, follow_redirects=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'Assigned user not found', response.data)
+        self.assertIsNone(Item.query.filter_by(name='Dock').first())
+
+
+    def test_batch_assign_items(self):
+        phone_1, phone_2 = self.add_items(2, prefix='Phone')
+        phone_2.name = phone_1.name
+        tablet, = self.add_items(1, assigned_to_id=self.user.id, prefix='Tablet')
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+
+        assignments = [
+            {'item_id': phone_1.id, 'user_id': self.user.id},
+            {'item_id': phone_2.id, 'user_id': self.user.id},
+            [tablet.id, None],
+            [999, self.user.id],
+            [self.item.id, self.admin.id],
+        ]
+        from services.table_versions import bump_versions
+        bump_versions('item')
+        with self.count_queries() as statements:
+            response = self.client.post('/admin_dashboard/assign_items', json={'assignments': assignments})
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual([result['success'] for result in results], [True, False, True, False, True])
+        self.assertEqual(results[1]['error'], 'User already has an item named Phone 0')
+        self.assertEqual(results[3]['error'], 'Item not found')
+        # three lookups, one UPDATE per distinct target, the history INSERT and the item change counter
+        self.assertEqual(len(statements), 8)
+
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Item, phone_1.id).assigned_to_id, self.user.id)
+        self.assertIsNone(db.session.get(Item, phone_2.id).assigned_to_id)
+        self.assertIsNone(db.session.get(Item, tablet.id).assigned_to_id)
+        self.assertEqual(db.session.get(Item, self.item.id).assigned_to_id, self.admin.id)
+
+    def test_batch_assign_items_rejects_bad_payload(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        response = self.client.post('/admin_dashboard/assign_items', json={'assignments': [['x', 1]]})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/admin_dashboard/assign_items', json={'assignments': [[self.item.id, True]]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(db.session.get(Item, self.item.id).assigned_to_id)
+
+    def test_batch_assign_items_applies_first_of_repeated_item(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        # The unassignment is processed first, but the assignment came first in the batch
+        response = self.client.post('/admin_dashboard/assign_items', json={'assignments': [
+            [self.item.id, self.user.id],
+            [self.item.id, None],
+        ]})
+        results = response.get_json()['results']
+        self.assertEqual([result['success'] for result in results], [True, False])
+        self.assertEqual(results[1]['error'], 'Item appears more than once in the batch')
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Item, self.item.id).assigned_to_id, self.user.id)
+
+    def test_assignment_queries_use_indexes(self):
+        self.add_items(3, assigned_to_id=self.user.id)
+        self.assert_uses_index(Item.query.filter_by(assigned_to_id=self.user.id, name='Desk 1'))
+        self.assert_uses_index(Item.query.filter_by(assigned_to_id=self.user.id))
+
+    def test_filtered_item_pages_use_indexes(self):
+        self.add_items(3, assigned_to_id=self.user.id, prefix='Chair')
+        self.add_items(3)
+        for filters in ({'name_prefix': 'Cha'}, {'status': 'assigned'}, {'status': 'unassigned'}):
+            for after_id in (None, self.item.id):
+                self.assert_uses_index(Item.page_query(**filters, after_id=after_id, columns=[Item.id, Item.name]))
+                self.assert_uses_index(Item.page_query(**filters, after_id=after_id))
+        self.assert_uses_index(Item.page_query(after_id=self.item.id))
+
+        # Name searches page in (name, id) order from the cursor item's name
+        first, cursor = Item.page(name_prefix='Chair', limit=2)
+        rest, end = Item.page(name_prefix='Chair', after_id=cursor, limit=2)
+        self.assertEqual([item.name for item in first + rest], ['Chair 0', 'Chair 1', 'Chair 2'])
+        self.assertIsNone(end)
+        self.assertEqual(Item.page(name_prefix='Chair_', limit=2)[0], [])
+
+    def test_assignment_history_queries_use_indexes(self):
+        from models.assignment_events import AssignmentEvent
+        since = datetime(2024, 1, 1)
+        self.assert_uses_index(AssignmentEvent.query.filter(
+            AssignmentEvent.item_id == self.item.id, AssignmentEvent.occurred_at > since))
+        self.assert_uses_index(AssignmentEvent.query.filter(
+            AssignmentEvent.user_id == self.user.id, AssignmentEvent.occurred_at > since))
+
+    def test_assignment_history_records_every_change(self):
+        from models.assignment_events import AssignmentEvent
+        desk, chair = self.add_items(2)
+        self.login_as_admin()
+        with self.client.session_transaction() as sess:
+            sess['id'] = self.admin.id
+        self.client.post('/admin_dashboard/assign_item', data={'item_id': desk.id, 'assigned_to': self.user.id})
+        self.client.post('/admin_dashboard/assign_items', json={'assignments': [[chair.id, self.user.id]]})
+        self.client.get(f'/admin_dashboard/unassign_item/{desk.id}')
+        self.client.post('/admin_dashboard/assign_item', data={'item_id': desk.id, 'assigned_to': self.admin.id})
+        self.client.delete('/delete_item', json={'id': desk.id})
+
+        events = db.session.execute(db.select(AssignmentEvent.item_id, AssignmentEvent.user_id, AssignmentEvent.actor_id)
+                                    .order_by(AssignmentEvent.id)).all()
+        self.assertEqual(events, [(desk.id, self.user.id, self.admin.id), (chair.id, self.user.id, self.admin.id),
+                                  (desk.id, None, self.admin.id), (desk.id, self.admin.id, self.admin.id),
+                                  (desk.id, None, self.admin.id)])
+
+    def test_search_finds_mistyped_serials_and_users(self):
+        self.add_items(5)
+        self.login_as_admin()
+        self.app.extensions['search_index'].build()
+        results = self.client.get('/api/v1/search?q=SN-Desk-3x').get_json()['results']
+        self.assertEqual((results[0]['type'], results[0]['serial_number']), ('item', 'SN-Desk-3'))
+        results = self.client.get('/api/v1/search?q=amdin@nucleusteq&type=user&limit=1').get_json()['results']
+        self.assertEqual([(result['type'], result['id']) for result in results], [('user', self.admin.id)])
+        self.assertEqual(self.client.get('/api/v1/search').status_code, 400)
+
+    def test_search_falls_back_to_prefix_queries_while_building(self):
+        self.add_items(3)
+        self.login_as_admin()
+        search_index = self.app.extensions['search_index']
+        results = self.client.get('/api/v1/search?q=SN-Desk-2').get_json()['results']
+        self.assertEqual([(result['serial_number'], result['score']) for result in results], [('SN-Desk-2', None)])
+        results = self.client.get('/api/v1/search?q=admin@&type=user').get_json()['results']
+        self.assertEqual([result['id'] for result in results], [self.admin.id])
+
+        # The first search started the build in the background
+        search_index.rebuild_thread and search_index.rebuild_thread.join()
+        self.assertIsNotNone(search_index.index)
+        results = self.client.get('/api/v1/search?q=SN-Desk-2x').get_json()['results']
+        self.assertEqual(results[0]['serial_number'], 'SN-Desk-2')
+        self.assertIsNotNone(results[0]['score'])
+
+    def test_search_index_follows_mutations(self):
+        self.login_as_admin()
+        self.app.extensions['search_index'].build()
+        self.assertEqual(self.client.get('/api/v1/search?q=Router').get_json()['results'], [])
+        self.client.post('/admin_dashboard/add_item', data={
+            'name': 'Router', 'serial_number': 'SN-R-1', 'bill_number': 'BN-R-1',
+            'date_of_purchase': '2023-01-01', 'warranty': '1 year'})
+        results = self.client.get('/api/v1/search?q=Router').get_json()['results']
+        self.assertEqual([result['serial_number'] for result in results], ['SN-R-1'])
+
+        self.client.delete('/delete_item', json={'id': results[0]['id']})
+        self.assertEqual(self.client.get('/api/v1/search?q=Router').get_json()['results'], [])
+
+        # A change committed by another worker is picked up by a background rebuild
+        from services.table_versions import bump_versions
+        db.session.add(Item(name='Switch', serial_number='SN-S-1', bill_number='BN-S-1',
+                            date_of_purchase=datetime(2023, 1, 1)))
+        db.session.commit()
+        bump_versions('item')
+        search_index = self.app.extensions['search_index']
+        search_index.rebuild_interval = 0
+        self.client.get('/api/v1/search?q=Switch')
+        search_index.rebuild_thread and search_index.rebuild_thread.join()
+        results = self.client.get('/api/v1/search?q=Switch').get_json()['results']
+        self.assertEqual([result['serial_number'] for result in results], ['SN-S-1'])
+
+    def test_assignment_history_ranges(self):
+        from models.assignment_events import AssignmentEvent
+        desk, chair = self.add_items(2)
+        day = timedelta(days=1)
+        start = datetime(2024, 3, 1)
+        for item_id, user_id, offset in [(desk.id, self.user.id, 0), (chair.id, self.user.id, 0),
+                                         (desk.id, self.admin.id, 2), (chair.id, None, 3), (desk.id, None, 10)]:
+            db.session.add(AssignmentEvent(item_id=item_id, user_id=user_id, occurred_at=start + offset * day))
+        db.session.commit()
+
+        self.assertEqual(AssignmentEvent.holders(desk.id, start + day, start + 4 * day),
+                         [(self.user.id, start, start + 2 * day), (self.admin.id, start + 2 * day, None)])
+        self.assertEqual(AssignmentEvent.held_by(self.user.id, start + 2.5 * day, start + 20 * day),
+                         [(chair.id, start, start + 3 * day)])
+        self.assertEqual(AssignmentEvent.held_by(self.admin.id, start + 20 * day, start + 30 * day), [])
+
+        self.login_as_admin()
+        response = self.client.get(f'/api/v1/items/history?serial={desk.serial_number}&date=2024-03-03')
+        self.assertEqual([holder['user_id'] for holder in response.get_json()['holders']], [self.admin.id])
+        response = self.client.get(f'/api/v1/users/{self.user.id}/history?from=2024-03-01&to=2024-03-02')
+        self.assertEqual([held['item_id'] for held in response.get_json()['items']], [desk.id, chair.id])
+        self.assertEqual(self.client.get('/api/v1/items/history?serial=nope&date=2024-03-03').status_code, 404)
+
+        # Offsets are converted to the naive UTC the events are stored in
+        response = self.client.get(f'/api/v1/users/{self.user.id}/history?from=2024-03-01T05:30%2B05:30'
+                                   '&to=2024-03-02T00:00%2B00:00')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([held['item_id'] for held in response.get_json()['items']], [desk.id, chair.id])
+        response = self.client.get(f'/api/v1/items/history?serial={desk.serial_number}&from=2024-01-01T00:00%2B00:00')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/api/v1/users/{self.user.id}/history?from=March').status_code, 400)
+
+    def test_schema_migrations_are_recorded(self):
+        from migrations import load_migrations
+        latest = load_migrations()[-1][0]
+        runner = self.app.test_cli_runner()
+        # migrations are idempotent over a schema built by create_all
+        result = runner.invoke(args=['db', 'upgrade'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        result = runner.invoke(args=['db', 'current'])
+        self.assertEqual(result.output.strip(), str(latest))
+
+        result = runner.invoke(args=['db', 'upgrade'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertNotIn('Applied', result.output)
+
+# assigned items cache
+    def test_assigned_items_cached_until_item_changes(self):
+        # An admin who also holds items
+        self.user.role = 'admin'
+        desk, = self.add_items(1, assigned_to_id=self.user.id)
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['id'] = self.user.id
+            sess['email'] = self.admin.email
+            sess['role'] = 'admin'
+
+        self.client.get('/assigned_item')
+        with self.count_queries() as statements:
+            response = self.client.get('/assigned_item')
+        self.assertIn(b'SN-Desk-0', response.data)
+        self.assertFalse([sql for sql in statements if 'FROM item' in sql])
+        stats = self.app.extensions['assigned_items_cache'].stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+        self.client.post('/edit_item', data={
+            'item_id': desk.id, 'name': 'Standing Desk', 'serial_number': 'SN-Desk-0',
+            'bill_number': 'BN-Desk-0', 'date_of_purchase': '2023-01-01', 'warranty': ''})
+        response = self.client.get('/assigned_item')
+        self.assertIn(b'Standing Desk', response.data)
+
+        self.client.post(f'/admin_dashboard/unassign_item/{desk.id}')
+        response = self.client.get('/assigned_item')
+        self.assertIn(b'No items assigned.', response.data)
+
+    def test_cache_stats_requires_admin(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.user.email
+            sess['id'] = self.user.id
+            sess['role'] = 'user'
+        self.assertEqual(self.client.get('/admin_dashboard/cache_stats').status_code, 403)
+
+    def test_metrics_record_sql_and_template_time_per_endpoint(self):
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        self.client.get('/admin_dashboard/all_users')
+        self.client.get('/no-such-page')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        lines = dict(line.rsplit(' ', 1) for line in response.get_data(as_text=True).splitlines()
+                     if not line.startswith('#'))
+        self.assertEqual(lines['http_requests_total{endpoint="auth_bp.all_users",status="200"}'], '1')
+        self.assertEqual(lines['http_requests_total{endpoint="unmatched",status="404"}'], '1')
+        self.assertEqual(lines['db_statements_per_request_count{endpoint="auth_bp.all_users"}'], '1')
+        self.assertEqual(lines['db_statements_per_request_bucket{endpoint="auth_bp.all_users",le="+Inf"}'], '1')
+        self.assertGreater(float(lines['db_statements_per_request_sum{endpoint="auth_bp.all_users"}']), 0)
+        self.assertGreater(float(lines['db_duration_seconds_sum{endpoint="auth_bp.all_users"}']), 0)
+        self.assertGreater(float(lines['template_render_seconds_sum{endpoint="auth_bp.all_users"}']), 0)
+        self.assertEqual(float(lines['template_render_seconds_sum{endpoint="unmatched"}']), 0)
+
+    def test_metrics_token_and_server_timing(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.app.config['METRICS_TOKEN'] = 'scrape-token'
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response.headers)
+
+        self.app.config['METRICS_SERVER_TIMING'] = True
+        with self.client.session_transaction() as sess:
+            sess['loggedin'] = True
+            sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
+        timing = self.client.get('/admin_dashboard/all_items').headers['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries", tpl;dur=[\d.]+$')
 
 #unassign item 
     def test_successful_item_unassignment(self):
         with self.client.session_transaction() as sess:
             sess['loggedin'] = True
             sess['email'] = self.admin.email
+            sess['id'] = self.admin.id
+            sess['role'] = 'admin'
         response = self.client.post(f'/admin_dashboard/unassign_item/{self.item.id}', follow_redirects=True)
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Item Unassigned successfully', response.data)
@@ -565,6 +1666,7 @@ class AuthTestCase(unittest.TestCase):
             sess['loggedin'] = True
             sess['id'] = self.admin.id
             sess['email'] = self.admin.email
+            sess['role'] = 'admin'
         
         response = self.client.delete('/delete_item', json={'id': item.id})
         self.assertEqual(response.status_code, 302)  # Redirect to items
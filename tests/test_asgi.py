@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime
+import importlib.util
+import json
+import unittest
+from app import db
+from models.users import User
+from models.items import Item
+from signals import send_users_changed
+
+
+# Parity between the ASGI JSON API and the sync Flask routes, over the same database
+@unittest.skipUnless(importlib.util.find_spec('greenlet'), 'async SQLAlchemy needs greenlet')
+class AsyncAPITestCase(unittest.TestCase):
+
+    def setUp(self):
+        from asgi import create_asgi_app
+        try:
+            self.api = create_asgi_app('testing')
+        except ImportError as e:
+            self.skipTest(f'async database driver not installed: {e}')
+        self.app = self.api.flask_app
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(first_name='Test', last_name='User', dob=datetime(1990, 1, 1),
+                         phone_no='1234567890', email='test@nucleusteq.com', password='password', role='user')
+        self.admin = User(first_name='Admin', last_name='User', dob=datetime(1980, 1, 1),
+                          phone_no='0987654321', email='admin@nucleusteq.com', password='adminpassword', role='admin')
+        db.session.add_all([self.user, self.admin])
+        db.session.commit()
+        self.items = [Item(name=f'Desk {i}', serial_number=f'SN-Desk-{i}', bill_number=f'BN-Desk-{i}',
+                           date_of_purchase=datetime(2023, 1, 1), assigned_to_id=self.user.id if i < 2 else None)
+                      for i in range(5)]
+        db.session.add_all(self.items)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, email, password):
+        self.client.post('/login', data={'email': email, 'password': password})
+        return f"session={self.client.get_cookie('session').value}"
+
+    def call(self, method, path, query='', body=None, cookie=None):
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query.encode(),
+            'headers': [(b'cookie', cookie.encode())] if cookie else [],
+        }
+        messages = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b''}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        async def run():
+            await self.api(scope, receive, send)
+            # Connections belong to this event loop
+            await self.api.engine.dispose()
+
+        asyncio.run(run())
+        return sent[0]['status'], json.loads(sent[1]['body'])
+
+    def test_item_list_matches_sync_route(self):
+        cookie = self.login('admin@nucleusteq.com', 'adminpassword')
+        for query in ('limit=2', f'limit=2&after={self.items[1].id}', 'status=assigned', 'q=desk&owner=%d' % self.user.id):
+            expected = self.client.get(f'/admin_dashboard/all_items.json?{query}').get_json()
+            status, payload = self.call('GET', '/api/items', query, cookie=cookie)
+            self.assertEqual(status, 200)
+            self.assertEqual(payload, expected, query)
+
+    def test_user_search_matches_sync_route(self):
+        cookie = self.login('admin@nucleusteq.com', 'adminpassword')
+        for query in ('q=adm', 'q=user&limit=1', 'q=test'):
+            expected = self.client.get(f'/admin_dashboard/employees/search?{query}').get_json()
+            self.assertEqual(self.call('GET', '/api/users/search', query, cookie=cookie), (200, expected))
+
+    def test_permissions_match_sync_routes(self):
+        self.assertEqual(self.call('GET', '/api/items')[0], 401)
+        cookie = self.login('test@nucleusteq.com', 'password')
+        self.assertEqual(self.call('GET', '/api/items', cookie=cookie)[0], 403)
+        self.assertEqual(self.call('GET', '/api/items', cookie='session=forged')[0], 401)
+        self.assertEqual(self.call('GET', '/api/nothing', cookie=cookie)[0], 404)
+
+        # The role comes from the current identity, not the one at login
+        admin_cookie = self.login('admin@nucleusteq.com', 'adminpassword')
+        self.assertEqual(self.call('GET', '/api/items', cookie=admin_cookie)[0], 200)
+        self.admin.role = 'user'
+        db.session.commit()
+        send_users_changed(self.app, user_ids=[self.admin.id])
+        self.assertEqual(self.call('GET', '/api/items', cookie=admin_cookie)[0], 403)
+
+    def test_assign_item_invalidates_sync_caches(self):
+        self.login('test@nucleusteq.com', 'password')
+        self.assertNotIn(b'Desk 4', self.client.get('/assigned_item').data)
+
+        admin_cookie = self.login('admin@nucleusteq.com', 'adminpassword')
+        body = {'item_id': self.items[4].id, 'assigned_to': self.user.id}
+        status, payload = self.call('POST', '/api/items/assign', body=body, cookie=admin_cookie)
+        self.assertEqual(status, 200)
+        self.assertEqual(payload['item']['assigned_to_id'], self.user.id)
+
+        # Same duplicate-name rule as the sync route
+        self.items[3].name = 'Desk 4'
+        db.session.commit()
+        body = {'item_id': self.items[3].id, 'assigned_to': self.user.id}
+        self.assertEqual(self.call('POST', '/api/items/assign', body=body, cookie=admin_cookie)[0], 409)
+
+        self.login('test@nucleusteq.com', 'password')
+        self.assertIn(b'Desk 4', self.client.get('/assigned_item').data)
+
+    def test_delete_item_and_user(self):
+        cookie = self.login('admin@nucleusteq.com', 'adminpassword')
+        status, payload = self.call('DELETE', '/api/items', body={'id': self.items[4].id}, cookie=cookie)
+        self.assertEqual((status, payload), (200, {'success': True}))
+        self.assertEqual(self.call('DELETE', '/api/items', body={'id': self.items[4].id}, cookie=cookie)[0], 404)
+
+        user_id = self.user.id
+        status, payload = self.call('DELETE', '/api/users', body={'id': user_id}, cookie=cookie)
+        self.assertEqual(status, 200)
+        db.session.expire_all()
+        self.assertIsNone(db.session.get(User, user_id))
+        self.assertEqual(Item.query.filter(Item.assigned_to_id.isnot(None)).count(), 0)
+        self.assertEqual(Item.query.count(), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import time
+import unittest
+from utils.cache import Cache, LRUCache, MemoryBackend, RedisBackend
+from utils.ratelimit import MemoryWindowStore, RedisWindowStore, SlidingWindowLimiter
+from utils.trigrams import TrigramIndex, trigrams
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b'0')) + 1).encode()
+        return int(self.data[key])
+
+    def expire(self, key, seconds):
+        return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((getattr(self.client, name), args))
+
+    def execute(self):
+        return [method(*args) for method, args in self.calls]
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_lru_entries_expire(self):
+        cache = LRUCache(maxsize=2, ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+
+    def test_cache_counts_hits_and_misses(self):
+        for backend in (MemoryBackend(), RedisBackend(FakeRedis())):
+            cache = Cache(backend)
+            self.assertIsNone(cache.get('assigned_items:1'))
+            cache.set('assigned_items:1', [{'id': 1, 'name': 'Laptop'}])
+            self.assertEqual(cache.get('assigned_items:1'), [{'id': 1, 'name': 'Laptop'}])
+            cache.delete('assigned_items:1')
+            self.assertIsNone(cache.get('assigned_items:1'))
+            self.assertEqual(cache.stats()['hits'], 1)
+            self.assertEqual(cache.stats()['misses'], 2)
+            self.assertEqual(cache.stats()['invalidations'], 1)
+
+
+
+class RateLimitTestCase(unittest.TestCase):
+
+    def test_sliding_window_weights_previous_window(self):
+        for store in (MemoryWindowStore(window=60), RedisWindowStore(FakeRedis(), window=60)):
+            limiter = SlidingWindowLimiter(store, limit=3)
+            self.assertEqual([limiter.hit('k', now=600 + i) for i in range(4)], [True, True, True, False])
+            # Half way through the next window, 4 * 0.5 earlier hits still count
+            self.assertTrue(limiter.hit('k', now=690))
+            self.assertFalse(limiter.hit('k', now=691))
+            # Two windows later the old hits are gone
+            self.assertTrue(limiter.hit('k', now=800))
+            limiter.reset('k')
+
+    def test_memory_store_sweeps_idle_keys(self):
+        store = MemoryWindowStore(window=60, sweep_interval=0.01)
+        store.hit('old', now=0)
+        time.sleep(0.02)
+        store.hit('new', now=600)
+        self.assertEqual(len(store), 1)
+
+
+
+class TrigramIndexTestCase(unittest.TestCase):
+
+    def make_index(self):
+        index = TrigramIndex(max_df=0.5)
+        for i in range(20):
+            index.add(('item', i), [f'Desk {i}', f'SN-{i:05d}'], i)
+        index.add(('user', 1), ['Priya', 'priya@nucleusteq.com'], 'priya')
+        return index
+
+    def test_trigrams_are_padded_and_lowercased(self):
+        self.assertEqual(trigrams('SN1'), {'  s', ' sn', 'sn1', 'n1 '})
+
+    def test_mistyped_serial_ranks_the_right_item_first(self):
+        score, key, payload = self.make_index().search('SN-00017x')[0]
+        self.assertEqual((key, payload), (('item', 17), 17))
+        score, key, payload = self.make_index().search('SN-00071', limit=3)[0]
+        self.assertIn(key, {('item', 17), ('item', 7)})
+
+    def test_readd_and_remove_retire_old_documents(self):
+        index = self.make_index()
+        index.add(('user', 1), ['Priyanka'], 'renamed')
+        self.assertEqual(index.search('priyanka', limit=1)[0][2], 'renamed')
+        self.assertFalse([key for _, key, _ in index.search('nucleusteq')])
+        index.remove(('item', 3))
+        self.assertNotIn(('item', 3), [key for _, key, _ in index.search('SN-00003')])
+        self.assertEqual(len(index), 20)
+
+    def test_accept_filters_and_limit(self):
+        results = self.make_index().search('desk', limit=5, accept=lambda key: key[1] % 2 == 0)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(key[1] % 2 == 0 for _, key, _ in results))
+        self.assertEqual(self.make_index().search('zzzz'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
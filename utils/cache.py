@@ -0,0 +1,123 @@
+from collections import OrderedDict
+import json
+import threading
+import time
+
+
+# Small thread-safe LRU map used for in-process caches; entries optionally expire after `ttl` seconds
+class LRUCache:
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Backends share get/set/delete; values must be JSON-serializable so they can live out of process
+class MemoryBackend:
+    def __init__(self, maxsize=10000, ttl=None):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+
+# Works with redis-py or any client exposing get/set(ex=)/delete, e.g. a local Redis-compatible server
+class RedisBackend:
+    def __init__(self, client, ttl=None, prefix='inventory:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+# Front for a backend that counts hits, misses and invalidations
+class Cache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def delete(self, key):
+        self.invalidations += 1
+        self.backend.delete(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def make_cache(config, prefix='inventory:'):
+    backend = config['CACHE_BACKEND']
+    ttl = config['CACHE_TTL']
+    if backend == 'memory':
+        return Cache(MemoryBackend(maxsize=config['CACHE_MAX_ENTRIES'], ttl=ttl))
+    if backend == 'redis':
+        import redis  # optional dependency, only needed for the shared backend
+        client = redis.Redis.from_url(config['CACHE_REDIS_URL'])
+        return Cache(RedisBackend(client, ttl=ttl, prefix=prefix))
+    raise ValueError(f'Unknown CACHE_BACKEND: {backend}')
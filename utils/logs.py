@@ -0,0 +1,106 @@
+import atexit
+from datetime import datetime, timezone
+import itertools
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+import os
+import queue
+from flask.logging import default_handler
+from utils.serialize import dumps
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+
+# One JSON object per line, for log shippers
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'path': record.pathname,
+            'line': record.lineno,
+        }
+        if getattr(record, 'sample_rate', None):
+            entry['sample_rate'] = record.sample_rate
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return dumps(entry).decode()
+
+
+# Keeps one in every 1/rate records of the listed below-WARNING message formats, e.g.
+# {'All items accessed': 0.01}. Kept records carry sample_rate so counts can be scaled back up.
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates):
+        super().__init__()
+        self.every = {message: max(1, round(1 / rate)) for message, rate in rates.items() if rate > 0}
+        self.dropped = {message for message, rate in rates.items() if rate <= 0}
+        self.counters = {message: itertools.count() for message in self.every}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if record.msg in self.dropped:
+            return False
+        every = self.every.get(record.msg)
+        if every is None:
+            return True
+        if next(self.counters[record.msg]) % every:
+            return False
+        record.sample_rate = 1 / every
+        return True
+
+
+def file_handler(config, filename, level):
+    path = os.path.join(config['LOG_DIR'], filename)
+    # delay=True opens the log files on first write rather than at startup
+    if config['LOG_ROTATE_WHEN']:
+        handler = TimedRotatingFileHandler(path, when=config['LOG_ROTATE_WHEN'],
+                                           backupCount=config['LOG_BACKUP_COUNT'], delay=True, utc=True)
+    else:
+        handler = RotatingFileHandler(path, maxBytes=config['LOG_MAX_BYTES'],
+                                      backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+    handler.setLevel(level)
+    handler.setFormatter(JSONFormatter() if config['LOG_JSON'] else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+# Route app.logger through a queue: request threads only enqueue the record, and a
+# listener thread does the formatting and file I/O. Replaces the pipeline a previous
+# create_app() in this process installed on the same logger.
+def init_logging(app):
+    logger = app.logger
+    # Flask's console handler would write synchronously on every call too
+    logger.removeHandler(default_handler)
+    for handler in [handler for handler in logger.handlers if isinstance(handler, QueueHandler)]:
+        logger.removeHandler(handler)
+        stop_listener(handler.listener)
+
+    listener = QueueListener(
+        queue.SimpleQueue(),
+        file_handler(app.config, 'general.log', logging.INFO),
+        file_handler(app.config, 'error.log', logging.ERROR),
+        respect_handler_level=True,
+    )
+    handler = QueueHandler(listener.queue)
+    handler.listener = listener
+    if app.config['LOG_SAMPLE_RATES']:
+        handler.addFilter(SamplingFilter(app.config['LOG_SAMPLE_RATES']))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.unregister(stop_listener)
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+# Drain the queue, then close the files
+def stop_listener(listener):
+    if listener._thread is not None:
+        listener.stop()
+    for handler in listener.handlers:
+        handler.close()
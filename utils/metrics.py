@@ -0,0 +1,200 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+from flask import g, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Label for requests that matched no route, so 404 probes cannot grow the registry
+UNMATCHED = 'unmatched'
+
+# Timings of the request being served on this thread/task. A context variable rather than
+# flask.g, so statements run by signal receivers in a nested app context still count.
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('started', 'statements', 'sql_seconds', 'sql_started',
+                 'template_seconds', 'template_started', 'template_depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.sql_started = 0.0
+        self.template_seconds = 0.0
+        self.template_started = 0.0
+        self.template_depth = 0
+
+
+# Cumulative Prometheus histogram over fixed buckets: memory stays the same however
+# many values are observed
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointMetrics:
+    __slots__ = ('duration', 'statements', 'sql', 'template', 'responses')
+
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.sql = Histogram(SECONDS_BUCKETS)
+        self.template = Histogram(SECONDS_BUCKETS)
+        self.responses = {}
+
+
+# name, help text, EndpointMetrics attribute
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'Wall time from the first before_request hook to the response.', 'duration'),
+    ('db_statements_per_request', 'SQL statements executed per request.', 'statements'),
+    ('db_duration_seconds', 'Time spent executing SQL per request.', 'sql'),
+    ('template_render_seconds', 'Time spent rendering templates per request.', 'template'),
+)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Per-endpoint histograms for this worker. Endpoints come from the URL map (plus
+# UNMATCHED) and statuses from HTTP, so the registry stays small.
+class RequestMetrics:
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, status, timings, duration):
+        with self._lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = EndpointMetrics()
+            metrics.duration.observe(duration)
+            metrics.statements.observe(timings.statements)
+            metrics.sql.observe(timings.sql_seconds)
+            metrics.template.observe(timings.template_seconds)
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+
+    # Prometheus text exposition format, version 0.0.4
+    def render(self):
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            lines = ['# HELP http_requests_total Responses sent, by endpoint and status.',
+                     '# TYPE http_requests_total counter']
+            for endpoint, metrics in endpoints:
+                label = escape_label(endpoint)
+                for status, count in sorted(metrics.responses.items()):
+                    lines.append(f'http_requests_total{{endpoint="{label}",status="{status}"}} {count}')
+            for name, description, attribute in HISTOGRAMS:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for endpoint, metrics in endpoints:
+                    label = escape_label(endpoint)
+                    histogram = getattr(metrics, attribute)
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{endpoint="{label}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{endpoint="{label}"}} {histogram.sum!r}')
+                    lines.append(f'{name}_count{{endpoint="{label}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def server_timing(timings, duration):
+    return (f'app;dur={duration * 1000:.2f}, '
+            f'db;dur={timings.sql_seconds * 1000:.2f};desc="{timings.statements} queries", '
+            f'tpl;dur={timings.template_seconds * 1000:.2f}')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    if timings is not None:
+        timings.sql_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    if timings is not None:
+        timings.statements += 1
+        timings.sql_seconds += time.perf_counter() - timings.sql_started
+
+
+def _before_render_template(app, template, context, **extra):
+    timings = _current.get()
+    # Only the outermost render counts: a template rendered from inside another is already timed
+    if timings is not None:
+        if not timings.template_depth:
+            timings.template_started = time.perf_counter()
+        timings.template_depth += 1
+
+
+def _template_rendered(app, template, context, **extra):
+    timings = _current.get()
+    if timings is not None and timings.template_depth:
+        timings.template_depth -= 1
+        if not timings.template_depth:
+            timings.template_seconds += time.perf_counter() - timings.template_started
+
+
+# Counts rendering done outside render_template (e.g. cached row fragments) as template time
+@contextmanager
+def template_timer():
+    _before_render_template(None, None, None)
+    try:
+        yield
+    finally:
+        _template_rendered(None, None, None)
+
+
+# Time every request, its SQL statements (all engines, replicas included) and its template
+# rendering into app.extensions['request_metrics']. With debug or METRICS_SERVER_TIMING on,
+# each response also carries the numbers in a Server-Timing header. Streamed bodies are
+# produced after the response leaves the hooks, so their generation time is not included.
+def init_metrics(app):
+    metrics = app.extensions['request_metrics'] = RequestMetrics()
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render_template)
+    template_rendered.connect(_template_rendered)
+
+    @app.before_request
+    def start_request_timings():
+        g.request_timings = timings = RequestTimings()
+        _current.set(timings)
+
+    @app.after_request
+    def record_request_timings(response):
+        timings = g.pop('request_timings', None)
+        if timings is None:
+            return response
+        duration = time.perf_counter() - timings.started
+        metrics.record(request.endpoint or UNMATCHED, response.status_code, timings, duration)
+        if app.debug or app.config['METRICS_SERVER_TIMING']:
+            response.headers['Server-Timing'] = server_timing(timings, duration)
+        return response
+
+    @app.teardown_request
+    def stop_request_timings(exc):
+        _current.set(None)
+
+    return metrics
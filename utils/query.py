@@ -0,0 +1,8 @@
+# LIKE pattern matching values that start with `prefix`, with wildcards escaped
+def prefix_pattern(prefix):
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+
+# Appended to a prefix for an exclusive upper bound on the values that start with it
+PREFIX_END = '\uffff'
@@ -0,0 +1,94 @@
+import threading
+import time
+
+
+# Sliding-window counters: each key keeps only this window's and the previous
+# window's hit counts, and the previous count is weighted by how much of it
+# still overlaps the sliding window. Stores return (current, previous).
+class MemoryWindowStore:
+    def __init__(self, window, sweep_interval=None):
+        self.window = window
+        self.sweep_interval = sweep_interval or window
+        self._counts = {}  # key -> (bucket, current, previous)
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.sweep_interval
+
+    def hit(self, key, now):
+        bucket = int(now // self.window)
+        with self._lock:
+            start, current, previous = self._counts.get(key, (bucket, 0, 0))
+            if bucket != start:
+                previous = current if bucket == start + 1 else 0
+                current = 0
+            current += 1
+            self._counts[key] = (bucket, current, previous)
+            if time.monotonic() >= self._next_sweep:
+                self._sweep(bucket)
+        return current, previous
+
+    def reset(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+    # Drop keys with no hits in the last two windows; they no longer affect any decision
+    def _sweep(self, bucket):
+        self._counts = {key: entry for key, entry in self._counts.items() if entry[0] >= bucket - 1}
+        self._next_sweep = time.monotonic() + self.sweep_interval
+
+    def __len__(self):
+        return len(self._counts)
+
+
+# Shares counts across worker processes; works with redis-py or any client with pipeline/incr/expire
+class RedisWindowStore:
+    def __init__(self, client, window, prefix='inventory:ratelimit:'):
+        self.client = client
+        self.window = window
+        self.prefix = prefix
+
+    def hit(self, key, now):
+        bucket = int(now // self.window)
+        name = f'{self.prefix}{key}:'
+        pipe = self.client.pipeline()
+        pipe.incr(f'{name}{bucket}')
+        pipe.expire(f'{name}{bucket}', self.window * 2)
+        pipe.get(f'{name}{bucket - 1}')
+        current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+    def reset(self, key):
+        bucket = int(time.time() // self.window)
+        name = f'{self.prefix}{key}:'
+        self.client.delete(f'{name}{bucket}', f'{name}{bucket - 1}')
+
+
+# Allows up to `limit` hits per key in any `window` seconds. Rejected hits are
+# counted too, so a client that keeps hammering stays locked out.
+class SlidingWindowLimiter:
+    def __init__(self, store, limit):
+        self.store = store
+        self.limit = limit
+        self.window = store.window
+        self.rejected = 0
+
+    def hit(self, key, now=None):
+        now = time.time() if now is None else now
+        current, previous = self.store.hit(key, now)
+        overlap = 1 - (now % self.window) / self.window
+        if previous * overlap + current > self.limit:
+            self.rejected += 1
+            return False
+        return True
+
+    def reset(self, key):
+        self.store.reset(key)
+
+
+def make_window_store(config, window):
+    backend = config['CACHE_BACKEND']
+    if backend == 'memory':
+        return MemoryWindowStore(window)
+    if backend == 'redis':
+        import redis  # optional dependency, only needed for the shared backend
+        return RedisWindowStore(redis.Redis.from_url(config['CACHE_REDIS_URL']), window)
+    raise ValueError(f'Unknown CACHE_BACKEND: {backend}')
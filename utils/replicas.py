@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from itertools import count
+import threading
+import time
+from flask import current_app, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from utils.pool import engine_options
+
+# Set while a @read_only view runs; holds per-view routing state
+_read_only = ContextVar('read_only', default=None)
+
+
+class Replica:
+    def __init__(self, engine, check_interval):
+        self.engine = engine
+        self.check_interval = check_interval
+        self.healthy = True
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def is_healthy(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return self.healthy
+        # Only one thread probes; the others keep using the last known state
+        if not self._lock.acquire(blocking=False):
+            return self.healthy
+        try:
+            try:
+                with self.engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                self.healthy = True
+            except Exception:
+                self.healthy = False
+                current_app.logger.warning('Replica %s failed its health check', self.engine.url)
+            self.checked_at = now
+        finally:
+            self._lock.release()
+        return self.healthy
+
+
+# Round-robin over the replicas that passed their last health check
+class ReplicaRouter:
+    def __init__(self, engines, check_interval=30):
+        self.replicas = [Replica(engine, check_interval) for engine in engines]
+        self._counter = count()
+
+    def choose(self):
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._counter) % len(self.replicas)]
+            if replica.is_healthy():
+                return replica.engine
+        return None
+
+    def status(self):
+        return [{'url': replica.engine.url.render_as_string(hide_password=True),
+                 'healthy': replica.healthy} for replica in self.replicas]
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        state = _read_only.get()
+        if bind is None and state is not None and not state['wrote'] and not self._flushing:
+            if state['engine'] is not None:
+                return state['engine']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# Route a view's queries to a replica unless this client wrote very recently. The replica
+# is chosen once per view, so every read in it (change counters included) sees one snapshot.
+def read_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        state = None
+        if time.time() >= session.get('primary_until', 0):
+            router = current_app.extensions.get('replica_router')
+            state = {'wrote': False, 'engine': router.choose() if router else None}
+        token = _read_only.set(state)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+    return wrapper
+
+
+# Queries inside the block go to the primary even within a @read_only view
+@contextmanager
+def on_primary():
+    token = _read_only.set(None)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def _mark_write():
+    state = _read_only.get()
+    if state is not None:
+        # Read-after-write inside this view stays on the primary
+        state['wrote'] = True
+    if has_request_context() and current_app.extensions.get('replica_router'):
+        # ...and so do this client's next requests, until replicas have caught up
+        session['primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+def _after_flush(db_session, flush_context):
+    _mark_write()
+
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_write()
+
+
+def init_replicas(app):
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if not uris:
+        return
+    engines = [create_engine(uri, **engine_options(app.config, uri)) for uri in uris]
+    app.extensions['replica_router'] = ReplicaRouter(
+        engines, check_interval=app.config['REPLICA_HEALTH_CHECK_INTERVAL'])
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'do_orm_execute', _do_orm_execute)
@@ -0,0 +1,22 @@
+import json
+
+try:
+    import orjson  # optional: several times faster than the json module on large lists
+except ImportError:
+    orjson = None
+
+
+def isoformat(value):
+    return value.isoformat()
+
+
+# Serialize to UTF-8 JSON bytes; dates and datetimes come out in ISO format either way
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':'), default=isoformat).encode()
+
+
+# Plain dicts straight from result rows, without hydrating ORM objects
+def rows_to_dicts(rows, fields):
+    return [dict(zip(fields, row)) for row in rows]
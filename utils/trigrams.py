@@ -0,0 +1,95 @@
+from array import array
+from collections import Counter
+import threading
+
+EMPTY = array('I')
+
+
+# Trigrams of a lowercased, padded string: 'SN1' -> {'  s', ' sn', 'sn1', 'n1 '}
+def trigrams(text):
+    padded = f'  {text.lower()} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# In-memory inverted index from trigrams to documents, for typo-tolerant top-k lookups.
+# Documents get numbers in insertion order and postings are append-only arrays of them;
+# re-adding a key retires its old number, and retired numbers are skipped at query time
+# until the next rebuild. Reads take no lock; writers are serialized.
+class TrigramIndex:
+    def __init__(self, max_df=0.02, min_similarity=0.3):
+        self.max_df = max_df
+        self.min_similarity = min_similarity
+        self._postings = {}
+        self._docs = []  # number -> (key, payload), None once retired
+        self._sizes = array('H')
+        self._numbers = {}  # key -> live number
+        self._lock = threading.Lock()
+
+    def add(self, key, fields, payload):
+        grams = set()
+        for value in fields:
+            if value:
+                grams |= trigrams(str(value))
+        with self._lock:
+            self._retire(key)
+            number = len(self._docs)
+            self._docs.append((key, payload))
+            self._sizes.append(min(len(grams), 0xFFFF))
+            self._numbers[key] = number
+            for gram in grams:
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array('I')
+                postings.append(number)
+
+    def remove(self, key):
+        with self._lock:
+            self._retire(key)
+
+    def _retire(self, key):
+        number = self._numbers.pop(key, None)
+        if number is not None:
+            self._docs[number] = None
+
+    def __len__(self):
+        return len(self._numbers)
+
+    # Best `limit` matches as [(score, key, payload)], score being the share of the query's
+    # informative trigrams a document contains. Trigrams found in more than `max_df` of the
+    # documents (a common serial prefix, say) cost the most to count and rank nothing, so
+    # they only take part when nothing rarer matched. `accept(key)` filters documents.
+    def search(self, query, limit=10, accept=None):
+        postings = sorted((self._postings.get(gram, EMPTY) for gram in trigrams(query)), key=len)
+        if not postings[-1]:
+            return []
+        cap = max(self.max_df * len(self._numbers), 64)
+        informative = [p for p in postings if len(p) <= cap] or postings[:1]
+        counts = Counter()
+        for p in informative:
+            counts.update(p)
+
+        wanted = len(informative)
+        threshold = max(1, self.min_similarity * wanted)
+        sizes, docs = self._sizes, self._docs
+        results = []
+        fetch = limit * 4 + 32
+        while True:
+            # most_common ranks in C; retired, filtered and tie-broken afterwards on the few it returns
+            top = counts.most_common(fetch)
+            matches = []
+            for number, shared in top:
+                if shared < threshold:
+                    break
+                doc = docs[number]
+                if doc is not None and (accept is None or accept(doc[0])):
+                    matches.append((shared, -sizes[number], number))
+            if len(matches) >= limit or len(top) < fetch or top[-1][1] < threshold:
+                break
+            fetch *= 4
+        # Most shared trigrams first, then the shortest (closest) documents
+        matches.sort(reverse=True)
+        for shared, _, number in matches[:limit]:
+            doc = docs[number]
+            if doc is not None:  # retired since it was ranked
+                results.append((shared / wanted,) + doc)
+        return results